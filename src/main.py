@@ -3,7 +3,7 @@ import os
 
 from setup.setup import setup
 from rag.segmenter.window_segmenter import WindowSegmenter
-from rag.presentation_gen.slide_generation import create_presentation_plan, generate_slide_descriptions_with_context
+from rag.presentation_gen.slide_generation import build_chunk_prompt, create_presentation_plan, generate_slide_descriptions_with_context
 from rag.segmenter.paragraph_segmenter import ParagraphSegmenter
 from rag.retriever.paragraph_retriever import ParagraphRetriever
 from rag.presentation_gen.build_presentation import build_presentation
@@ -16,18 +16,29 @@ def main():
 
     OPENROUTER_API_KEY = os.getenv("API_KEY")
 
-    text, images_dict = pdf_to_text("./src/pdf_files/example.pdf")
+    document, images_dict = pdf_to_text("./src/pdf_files/example.pdf")
 
-    window_segmenter = WindowSegmenter(text)
+    # с PLAN_MAX_TOKENS окна набираются по бюджету токенов с учетом промпта и места под релевантные сегменты
+    plan_max_tokens = int(os.getenv("PLAN_MAX_TOKENS")) if os.getenv("PLAN_MAX_TOKENS") else None
+    window_segmenter = WindowSegmenter(document, max_tokens=plan_max_tokens, prompt=build_chunk_prompt("", 0, 1),
+                                       reserve_tokens=int(os.getenv("PLAN_RESERVE_TOKENS", "2000")))
     chunks = window_segmenter.split()
 
-    segmenter = ParagraphSegmenter(text)
-    segments = segmenter.split()
+    segmenter = ParagraphSegmenter(document)
+    segment_spans = list(segmenter.spans())
+    segments = [document.span_text(span) for span in segment_spans]
+    # маркеры картинок каждого сегмента находятся один раз по индексу якорей документа
+    segment_markers = [[marker for marker in document.markers_in(*span) if marker in images_dict]
+                       for span in segment_spans]
 
-    retriever = ParagraphRetriever(segments)
-    temp_slides = create_presentation_plan(chunks, OPENROUTER_API_KEY)
-    relevant_segments = retriever.retrieve_relevant_segments(temp_slides)
-    retriever.clear()
+    # RETRIEVAL_MODE: dense (по умолчанию), hybrid (BM25-кандидаты переоцениваются моделью) или lexical (только BM25)
+    retriever = ParagraphRetriever(segments, segment_spans, mode=os.getenv("RETRIEVAL_MODE", "dense"))
+    try:
+        temp_slides = create_presentation_plan(chunks, OPENROUTER_API_KEY)
+        relevant_indices = retriever.retrieve_relevant_indices(temp_slides)
+    finally:
+        retriever.clear()
+    relevant_segments = [" ".join(segments[idx] for idx in indices) for indices in relevant_indices]
 
     slides = create_presentation_plan(chunks, OPENROUTER_API_KEY, relevant_segments)
     # slides = create_presentation_plan2(temp_slides, OPENROUTER_API_KEY, relevant_segments)
@@ -37,26 +48,23 @@ def main():
     print(f"{'='*60}")
     
     enhanced_slides = []
-    for i, (slide, segment) in enumerate(zip(slides, relevant_segments)):
-        slide_has_image = False
-        for img_marker in images_dict.keys():
-            if img_marker in segment:
-                img_path = f"extracted_images/slide_{i+1}_{img_marker.replace('[', '').replace(']', '').lower()}.png"
-                os.makedirs(os.path.dirname(img_path), exist_ok=True)
-                images_dict[img_marker].save(img_path)
-                
-                slide_with_image = slide.copy()
-                slide_with_image["visualization"] = {
-                    "needed": True,
-                    "type": "extracted_image",
-                    "image_path": img_path,
-                    "chart_title": f"Изображение {img_marker}"
-                }
-                enhanced_slides.append(slide_with_image)
-                slide_has_image = True
-                break
-        
-        if not slide_has_image:
+    for i, (slide, indices) in enumerate(zip(slides, relevant_indices)):
+        slide_markers = [marker for idx in indices for marker in segment_markers[idx]]
+        if slide_markers:
+            img_marker = min(slide_markers, key=document.position)
+            img_path = f"extracted_images/slide_{i+1}_{img_marker.replace('[', '').replace(']', '').lower()}{images_dict[img_marker].extension}"
+            os.makedirs(os.path.dirname(img_path), exist_ok=True)
+            images_dict[img_marker].save(img_path)
+
+            slide_with_image = slide.copy()
+            slide_with_image["visualization"] = {
+                "needed": True,
+                "type": images_dict[img_marker].vis_type,
+                "image_path": img_path,
+                "chart_title": f"Изображение {img_marker}"
+            }
+            enhanced_slides.append(slide_with_image)
+        else:
             enhanced_slides.append(slide)
     
     slides_without_images = []
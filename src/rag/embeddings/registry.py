@@ -0,0 +1,150 @@
+import gc
+import os
+import threading
+import time
+from typing import Optional
+
+import torch
+from sentence_transformers import SentenceTransformer
+
+def _available_memory() -> Optional[int]:
+    """Свободная оперативная память в байтах или None, если ее не узнать"""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+class ModelRegistry:
+    """Модели эмбеддингов процесса. Каждая модель загружается один раз и выдается всем сегментаторам
+       и ретриверам по ссылке. Модель выгружается, только если к ней не обращались idle_seconds,
+       или перед загрузкой другой модели, когда свободной памяти меньше min_free_bytes.
+       Модель, взятая через acquire и еще не отпущенная через release, не выгружается никогда:
+       иначе следующий get загрузил бы вторую копию, пока первую держит ретривер.
+       Счетчики загрузок, попаданий и выгрузок доступны через metrics"""
+
+    def __init__(self, idle_seconds: float = 600, min_free_bytes: int = 0):
+        self.idle_seconds = idle_seconds
+        self.min_free_bytes = min_free_bytes
+        self._models = {}
+        self._last_used = {}
+        self._refs = {}
+        self._lock = threading.RLock()
+        self._timer = None
+        self._metrics = {"loads": 0, "hits": 0, "evictions": 0, "load_seconds": 0.0}
+
+    def get(self, name: str, device: Optional[str] = None) -> SentenceTransformer:
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        key = (name, device)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                self._free_memory()
+                started = time.perf_counter()
+                model = self._models[key] = SentenceTransformer(name, device=device)
+                self._metrics["loads"] += 1
+                self._metrics["load_seconds"] += time.perf_counter() - started
+            else:
+                self._metrics["hits"] += 1
+            self._last_used[key] = time.monotonic()
+            self._schedule()
+        return model
+
+    def acquire(self, name: str, device: Optional[str] = None) -> SentenceTransformer:
+        """Модель, которая не будет выгружена до парного вызова release"""
+        with self._lock:
+            model = self.get(name, device)
+            key = self._key(model)
+            self._refs[key] = self._refs.get(key, 0) + 1
+        return model
+
+    def release(self, model: SentenceTransformer):
+        """Отпускает модель, взятую через acquire. Время простоя отсчитывается с последнего release"""
+        with self._lock:
+            key = self._key(model)
+            if key is None or not self._refs.get(key):
+                return
+            self._refs[key] -= 1
+            if not self._refs[key]:
+                del self._refs[key]
+                self._last_used[key] = time.monotonic()
+                self._schedule()
+
+    def _key(self, model: SentenceTransformer) -> Optional[tuple]:
+        return next((key for key, loaded in self._models.items() if loaded is model), None)
+
+    def _idle(self) -> list[tuple]:
+        """Загруженные модели, которые никто не держит, от давно не использованных к недавним"""
+        return sorted((key for key in self._last_used if key not in self._refs), key=self._last_used.get)
+
+    def evict_idle(self):
+        """Выгружает модели, к которым не обращались дольше idle_seconds и которые никто не держит"""
+        with self._lock:
+            now = time.monotonic()
+            for key in [key for key in self._idle() if now - self._last_used[key] >= self.idle_seconds]:
+                self._evict(key)
+            self._timer = None
+            self._schedule()
+
+    def clear(self):
+        """Выгружает все модели, которые никто не держит"""
+        with self._lock:
+            for key in self._idle():
+                self._evict(key)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "loaded": [name for name, _ in self._models],
+                    "in_use": [name for name, _ in self._refs]}
+
+    def _free_memory(self):
+        """Перед загрузкой модели при нехватке памяти выгружает свободные модели, начиная с давно не использованных"""
+        if not self.min_free_bytes:
+            return
+        for key in self._idle():
+            available = _available_memory()
+            if available is None or available >= self.min_free_bytes:
+                return
+            self._evict(key)
+
+    def _evict(self, key: tuple):
+        del self._models[key]
+        del self._last_used[key]
+        self._metrics["evictions"] += 1
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _schedule(self):
+        """Таймер проверки простоя: один на реестр, перезапускается, пока загружены свободные модели"""
+        idle = self._idle()
+        if self._timer is not None or not idle:
+            return
+        delay = self.idle_seconds - (time.monotonic() - self._last_used[idle[0]])
+        self._timer = threading.Timer(max(delay, 0), self.evict_idle)
+        self._timer.daemon = True
+        self._timer.start()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ModelRegistry:
+    """Реестр моделей процесса. Время простоя до выгрузки задается EMBEDDING_IDLE_SECONDS (по умолчанию 600),
+       порог свободной памяти - EMBEDDING_MIN_FREE_MB (по умолчанию не проверяется)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(float(os.getenv("EMBEDDING_IDLE_SECONDS", "600")),
+                                      int(os.getenv("EMBEDDING_MIN_FREE_MB", "0")) * 1024 * 1024)
+    return _registry
+
+def get_model(name: str = 'ai-forever/FRIDA', device: Optional[str] = None) -> SentenceTransformer:
+    return get_registry().get(name, device)
+
+def acquire_model(name: str = 'ai-forever/FRIDA', device: Optional[str] = None) -> SentenceTransformer:
+    """Модель из реестра, которую реестр не выгрузит, пока ее не отпустят через release_model"""
+    return get_registry().acquire(name, device)
+
+def release_model(model: SentenceTransformer):
+    get_registry().release(model)
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+from typing import Optional
+
+import numpy as np
+
+class EmbeddingStore:
+    """Дисковое хранилище эмбеддингов сегментов. Ключ - модель, префикс запроса и хэш текста сегмента.
+       Для каждой пары (модель, префикс) своя папка с частями: массив векторов .npy и список ключей его строк.
+       Часть пишется один раз на вызов encode атомарно (временный файл + os.replace, ключи последними),
+       поэтому хранилище можно делить между процессами. Список ключей части читается один раз, сама часть
+       открывается через memmap только на время чтения ее строк, кодируются только сегменты, которых еще нет
+       в хранилище. Части, удаленные другим процессом или испорченные, забываются, их сегменты кодируются заново.
+       При превышении max_bytes части вытесняются по LRU: время изменения части обновляется при каждом чтении"""
+
+    def __init__(self, store_dir: str, dtype: str = "float16", max_bytes: int = 2048 * 1024 * 1024):
+        self.store_dir = store_dir
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        os.makedirs(store_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._known = {}
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _namespace(self, model_name: str, prefix: str) -> str:
+        digest = hashlib.sha256(f"{model_name}\0{prefix}".encode("utf-8")).hexdigest()[:16]
+        path = os.path.join(self.store_dir, digest)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _refresh(self, namespace: str) -> dict:
+        """Индекс ключ -> (часть, строка) папки: дополняется частями, которые записали другие процессы,
+           и очищается от частей, которые другие процессы вытеснили"""
+        index = self._index.setdefault(namespace, {})
+        known = self._known.setdefault(namespace, set())
+        present = set()
+        for name in os.listdir(namespace):
+            if not name.endswith(".keys.json"):
+                continue
+            shard = os.path.join(namespace, name[:-len(".keys.json")] + ".npy")
+            present.add(shard)
+            if shard in known:
+                continue
+            # испорченный список ключей тоже запоминается, чтобы не разбирать его при каждом вызове
+            known.add(shard)
+            try:
+                with open(os.path.join(namespace, name), encoding="utf-8") as f:
+                    keys = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for row, key in enumerate(keys):
+                index.setdefault(key, (shard, row))
+        vanished = known - present
+        known -= vanished
+        self._forget(namespace, vanished)
+        return index
+
+    def _forget(self, namespace: str, shards: set):
+        """Убирает строки частей из индекса папки. Испорченная часть остается известной,
+           поэтому ее список ключей не читается снова, а сама она со временем вытесняется"""
+        if not shards:
+            return
+        index = self._index.get(namespace, {})
+        for key in [key for key, (shard, _) in index.items() if shard in shards]:
+            del index[key]
+
+    def _write(self, namespace: str, keys: list[str], vectors: np.ndarray) -> str:
+        shard_id = uuid.uuid4().hex
+        shard = os.path.join(namespace, f"{shard_id}.npy")
+        self._atomic_write(shard, lambda f: np.save(f, vectors.astype(self.dtype)), "wb")
+        keys_path = os.path.join(namespace, f"{shard_id}.keys.json")
+        self._atomic_write(keys_path, lambda f: f.write(json.dumps(keys)), "w")
+        self._size += os.path.getsize(shard) + os.path.getsize(keys_path)
+        return shard
+
+    @staticmethod
+    def _atomic_write(path: str, write, mode: str):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def encode(self, model, model_name: str, texts: list[str], prefix: str = "") -> np.ndarray:
+        """Эмбеддинги текстов (n, d) float32: найденные в хранилище читаются из memmap,
+           остальные кодируются моделью с префиксом prefix и дописываются новой частью"""
+        namespace = self._namespace(model_name, prefix)
+        keys = [self.key(text) for text in texts]
+
+        with self._lock:
+            index = self._refresh(namespace)
+
+            rows_by_shard = {}
+            for i, key in enumerate(keys):
+                if key in index:
+                    shard, row = index[key]
+                    positions, rows = rows_by_shard.setdefault(shard, ([], []))
+                    positions.append(i)
+                    rows.append(row)
+
+            found = []
+            for shard, (positions, rows) in rows_by_shard.items():
+                try:
+                    found.append((positions, np.asarray(np.load(shard, mmap_mode="r")[rows], dtype=np.float32)))
+                except (OSError, ValueError, IndexError):
+                    # часть вытеснена другим процессом или испорчена: ее сегменты кодируются заново
+                    self._forget(namespace, {shard})
+                    continue
+                try:
+                    os.utime(shard)
+                except OSError:
+                    pass
+
+            computed = {}
+            misses = list(dict.fromkeys(key for key in keys if key not in index))
+            if misses:
+                texts_by_key = dict(zip(keys, texts))
+                vectors = np.asarray(model.encode([prefix + texts_by_key[key] for key in misses], convert_to_numpy=True))
+                computed = dict(zip(misses, vectors))
+                try:
+                    shard = self._write(namespace, misses, vectors)
+                    self._known[namespace].add(shard)
+                    index.update((key, (shard, row)) for row, key in enumerate(misses))
+                except OSError:
+                    # хранилище недоступно для записи, эмбеддинги возвращаются без сохранения
+                    pass
+
+            if not keys:
+                return np.empty((0, 0), dtype=np.float32)
+            dim = found[0][1].shape[1] if found else len(computed[keys[0]])
+            result = np.empty((len(keys), dim), dtype=np.float32)
+            for positions, vectors in found:
+                result[positions] = vectors
+            for i, key in enumerate(keys):
+                if key in computed:
+                    result[i] = computed[key]
+
+            if self._size > self.max_bytes:
+                self._evict()
+            return result
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        """Части хранилища (время изменения, путь .npy, размер вместе со списком ключей)"""
+        entries = []
+        for root, _, files in os.walk(self.store_dir):
+            for name in files:
+                if not name.endswith(".keys.json"):
+                    continue
+                keys_path = os.path.join(root, name)
+                shard = keys_path[:-len(".keys.json")] + ".npy"
+                try:
+                    stat = os.stat(shard)
+                    size = stat.st_size + os.path.getsize(keys_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, shard, size))
+        return entries
+
+    def _evict(self):
+        """Удаляет давно не читавшиеся части, пока хранилище не уменьшится до 90% от max_bytes.
+           Размер пересчитывается по диску, так как в хранилище пишут и другие процессы.
+           Список ключей удаляется первым, чтобы другие процессы перестали находить часть"""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+
+        evicted = {}
+        for _, shard, size in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            for path in (shard[:-len(".npy")] + ".keys.json", shard):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._size -= size
+            evicted.setdefault(os.path.dirname(shard), set()).add(shard)
+
+        for namespace, shards in evicted.items():
+            self._known.get(namespace, set()).difference_update(shards)
+            self._forget(namespace, shards)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> Optional[EmbeddingStore]:
+    """Хранилище эмбеддингов процесса в папке EMBEDDING_STORE_DIR или None, если переменная не задана.
+       Предельный размер задается EMBEDDING_STORE_MAX_MB (по умолчанию 2048)"""
+    global _store
+    with _store_lock:
+        if _store is None and os.getenv("EMBEDDING_STORE_DIR"):
+            _store = EmbeddingStore(os.getenv("EMBEDDING_STORE_DIR"), os.getenv("EMBEDDING_STORE_DTYPE", "float16"),
+                                    int(os.getenv("EMBEDDING_STORE_MAX_MB", "2048")) * 1024 * 1024)
+    return _store
+
+def encode_documents(model, model_name: str, texts: list[str], prefix: str = "") -> np.ndarray:
+    """Эмбеддинги текстов через хранилище процесса, если оно настроено, иначе напрямую моделью"""
+    store = get_store()
+    if store is None:
+        return np.asarray(model.encode([prefix + text for text in texts], convert_to_numpy=True), dtype=np.float32)
+    return store.encode(model, model_name, texts, prefix)
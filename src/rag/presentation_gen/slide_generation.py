@@ -4,11 +4,12 @@ import time
 from typing import List, Dict
 
 
-def generate_slides_for_chunk(chunk: str, chunk_index: int, chunks_num: int, api_key: str, relevant_segments: list = None) -> List[Dict]:    
+def build_chunk_prompt(chunk: str, chunk_index: int, chunks_num: int, relevant_segments: list = None) -> str:
+    """Промпт планирования слайдов для одной части документа"""
     if relevant_segments is None:
         relevant_segments = []
-        
-    prompt = f"""
+
+    return f"""
 Текст для анализа:
 {chunk}
  
@@ -47,6 +48,10 @@ def generate_slides_for_chunk(chunk: str, chunk_index: int, chunks_num: int, api
     ]
 }}
 """
+
+
+def generate_slides_for_chunk(chunk: str, chunk_index: int, chunks_num: int, api_key: str, relevant_segments: list = None) -> List[Dict]:    
+    prompt = build_chunk_prompt(chunk, chunk_index, chunks_num, relevant_segments)
     max_attempts = 5
     
     for i in range(max_attempts):
@@ -0,0 +1,71 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+from nltk.stem.snowball import SnowballStemmer
+
+TOKEN_PATTERN = re.compile(r"\w+")
+CYRILLIC_PATTERN = re.compile("[\u0400-\u04ff]")
+
+_russian = SnowballStemmer("russian")
+_english = SnowballStemmer("english")
+
+@lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    """Основа слова стеммером Snowball: русским для слов с кириллицей, английским для остальных"""
+    return (_russian if CYRILLIC_PATTERN.search(word) else _english).stem(word)
+
+def tokenize(text: str) -> list[str]:
+    return [stem(word) for word in TOKEN_PATTERN.findall(text.lower())]
+
+class BM25Index:
+    """Инвертированный индекс BM25 по сегментам. Списки документов всех термов склеены в плоские массивы
+       со смещениями по термам, вклад каждого вхождения (idf и насыщение частоты с поправкой на длину) считается
+       при построении, поэтому оценка запроса - сумма готовых весов по спискам его термов"""
+
+    def __init__(self, texts: list[str], k1: float = 1.5, b: float = 0.75):
+        self.vocabulary = {}
+        term_ids, doc_ids, frequencies = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.float64)
+
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for term, frequency in counts.items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc)
+                frequencies.append(frequency)
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.offsets = np.concatenate(([0], np.cumsum(document_frequency)))
+        self.doc_ids = np.array(doc_ids, dtype=np.int64)[order]
+
+        n = len(texts)
+        idf = np.log(1 + (n - document_frequency + 0.5) / (document_frequency + 0.5))
+        tf = np.array(frequencies, dtype=np.float64)[order]
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / max(lengths.mean() if n else 0, 1e-9))
+        self.weights = idf[term_ids[order]] * tf * (k1 + 1) / (tf + norm)
+        self.size = n
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float64)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # в списке терма каждый документ встречается один раз
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def top(self, query: str, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """Номера и оценки не больше n сегментов с ненулевой оценкой по убыванию оценки"""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > n:
+            matched = matched[np.argpartition(-scores[matched], n - 1)[:n]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return matched, scores[matched]
@@ -0,0 +1,145 @@
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    """Номер ближайшего по скалярному произведению центроида для каждого вектора, блоками по block строк"""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for first in range(0, len(vectors), block):
+        assignment[first:first + block] = np.argmax(vectors[first:first + block] @ centroids.T, axis=1)
+    return assignment
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class IVFIndex:
+    """Приближенный поиск по скалярному произведению для больших документов (инвертированные списки, IVF).
+       Векторы делятся сферическим k-means на nlist кластеров, запрос сравнивается только с векторами
+       nprobe ближайших кластеров. Векторы хранятся упорядоченными по кластерам, списки задаются смещениями,
+       поэтому индекс - это несколько плоских массивов, которые сохраняются в один .npz"""
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 32, iterations: int = 10,
+                 train_size: int = 256, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.train_size = train_size
+        self.seed = seed
+        self.fingerprint = ""
+        self.centroids = None
+        self.offsets = None
+        self.ids = None
+        self.vectors = None
+
+    def build(self, vectors: np.ndarray) -> "IVFIndex":
+        """Обучает центроиды на подвыборке (не больше train_size векторов на кластер) и раскладывает все векторы
+           по спискам. По умолчанию nlist - корень из числа векторов"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        nlist = min(n, self.nlist or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+
+        sample = vectors[rng.choice(n, min(n, nlist * self.train_size), replace=False)]
+        unit = _normalize(sample)
+        centroids = unit[rng.choice(len(unit), nlist, replace=False)]
+        for _ in range(self.iterations):
+            assignment = _assign(unit, centroids)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(unit[order], np.concatenate(([0], np.cumsum(counts)[:-1]))[filled])
+            # пустой кластер получает случайный вектор выборки
+            sums[~filled] = unit[rng.choice(len(unit), int((~filled).sum()))]
+            centroids = _normalize(sums)
+
+        assignment = _assign(vectors, centroids)
+        self.ids = np.argsort(assignment, kind="stable")
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=nlist))))
+        self.vectors = vectors[self.ids]
+        self.centroids = centroids.astype(np.float32)
+        return self
+
+    def __len__(self) -> int:
+        return 0 if self.ids is None else len(self.ids)
+
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """Оценки и номера (q, k) лучших векторов по убыванию оценки. Если в просмотренных кластерах
+           меньше k векторов, хвост номеров заполнен -1, а оценок - -inf"""
+        queries = np.asarray(queries, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists])
+            candidate_scores = self.vectors[candidates] @ query
+            top = min(k, len(candidates))
+            if top == 0:
+                continue
+            best = np.argpartition(-candidate_scores, top - 1)[:top]
+            best = best[np.argsort(-candidate_scores[best], kind="stable")]
+            scores[row, :top] = candidate_scores[best]
+            indices[row, :top] = self.ids[candidates[best]]
+        return scores, indices
+
+    def save(self, path: str):
+        """Сохраняет индекс в .npz. fingerprint позволяет проверить при загрузке, что индекс от тех же сегментов.
+           Запись атомарная (временный файл + os.replace), поэтому недописанный индекс не загрузит другой процесс"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, centroids=self.centroids, offsets=self.offsets, ids=self.ids, vectors=self.vectors,
+                         nprobe=self.nprobe, fingerprint=self.fingerprint)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            index = cls(nlist=len(data["centroids"]), nprobe=int(data["nprobe"]))
+            index.centroids = data["centroids"]
+            index.offsets = data["offsets"]
+            index.ids = data["ids"]
+            index.vectors = data["vectors"]
+            index.fingerprint = str(data["fingerprint"])
+        return index
+
+def prune_indexes(directory: str, max_bytes: int):
+    """Удаляет из папки самые старые по времени изменения индексы .npz, пока их размер больше max_bytes"""
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".npz"):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, os.path.join(directory, name), stat.st_size))
+
+    size = sum(entry[2] for entry in entries)
+    for _, path, file_size in sorted(entries):
+        if size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        size -= file_size
+
+def recall_at_k(index: IVFIndex, vectors: np.ndarray, queries: np.ndarray, k: int,
+                nprobe: Optional[int] = None) -> float:
+    """Доля точных k лучших векторов (полный перебор по vectors), которые находит индекс"""
+    exact = np.argsort(-(np.asarray(queries, dtype=np.float32) @ np.asarray(vectors, dtype=np.float32).T),
+                       axis=1, kind="stable")[:, :k]
+    _, found = index.search(queries, k, nprobe)
+    hits = sum(len(set(e.tolist()) & set(f.tolist())) for e, f in zip(exact, found))
+    return hits / exact.size if exact.size else 1.0
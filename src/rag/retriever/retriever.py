@@ -1,9 +1,192 @@
+import hashlib
+import os
+import zipfile
+from typing import NamedTuple, Optional
+
+import numpy as np
+import torch
+
+from rag.embeddings.registry import acquire_model, release_model
+from rag.embeddings.store import encode_documents, get_store
+from .bm25 import BM25Index
+from .ivf_index import IVFIndex, prune_indexes
+
+class Hit(NamedTuple):
+    """Найденный сегмент: номер в списке сегментов, близость к запросу и интервал в тексте документа"""
+    index: int
+    score: float
+    span: Optional[tuple[int, int]]
+
 class Retriever:
-    def __init__(self, segments: list[str]):
+    """Плотный поиск сегментов для слайдов. Эмбеддинги сегментов считаются один раз, близости всех запросов
+       ко всем сегментам - одним умножением матриц (блоками по запросам, чтобы матрица близостей занимала
+       не больше max_scores элементов), лучшие сегменты - одним batched topk. Наследники задают только модель,
+       префикс сегментов, число сегментов на слайд и текст запроса.
+       Начиная с ann_threshold сегментов вместо полного перебора используется приближенный индекс IVFIndex.
+       Индекс сохраняется в index_path (по умолчанию в папку ivf хранилища эмбеддингов, если оно настроено)
+       и при следующем запуске с теми же сегментами загружается без кодирования. Папка ivf хранилища
+       ограничена max_index_bytes, давно не использованные индексы из нее удаляются.
+       Режим mode: dense - плотный поиск по всем сегментам, hybrid - BM25 отбирает prefilter кандидатов
+       на запрос, и кодируются и переоцениваются моделью только они, lexical - только BM25, без модели.
+       В обоих лексических режимах запрос получает limit сегментов, даже если совпадений BM25 меньше:
+       hybrid добирает их плотной оценкой по объединению кандидатов, lexical - сегментами без совпадений
+       в порядке документа с нулевой оценкой"""
+    model_name = 'ai-forever/FRIDA'
+    document_prefix = "search_document: "
+    limit = 3
+    max_scores = 16 * 1024 * 1024
+    ann_threshold = 20000
+    max_index_bytes = 1024 * 1024 * 1024
+    prefilter = 50
+
+    def __init__(self, segments: list[str], spans: Optional[list[tuple[int, int]]] = None,
+                 index_path: Optional[str] = None, mode: str = "dense"):
+        if mode not in ("dense", "hybrid", "lexical"):
+            raise ValueError(f"Неизвестный режим поиска: {mode}")
         self.segments = segments
+        self.spans = spans
+        self.mode = mode
+        self.model = acquire_model(self.model_name) if mode != "lexical" else None
+        self.lexical = BM25Index(segments) if mode != "dense" else None
+        self.index = None
+        self.segments_embeddings = None
+
+        if mode == "dense":
+            self._build_dense(index_path)
 
-    def retrieve_relevant_segments(self, slides) -> list[str]:
+    def _build_dense(self, index_path: Optional[str]):
+        fingerprint = self._fingerprint()
+        store = get_store()
+        index_dir = None
+        if index_path is None and store is not None:
+            index_dir = os.path.join(store.store_dir, "ivf")
+            index_path = os.path.join(index_dir, f"{fingerprint}.npz")
+        if index_path is not None and os.path.exists(index_path):
+            try:
+                index = IVFIndex.load(index_path)
+            except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+                index = None
+            if index is not None and index.fingerprint == fingerprint:
+                self.index = index
+                try:
+                    os.utime(index_path)
+                except OSError:
+                    pass
+                return
+
+        embeddings = encode_documents(self.model, self.model_name, self.segments, self.document_prefix)
+        if len(self.segments) >= self.ann_threshold:
+            self.index = IVFIndex().build(embeddings)
+            self.index.fingerprint = fingerprint
+            if index_path is not None:
+                try:
+                    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+                    self.index.save(index_path)
+                    # чужие папки не чистятся, только папка индексов хранилища
+                    if index_dir is not None:
+                        prune_indexes(index_dir, self.max_index_bytes)
+                except OSError:
+                    pass
+        else:
+            self.segments_embeddings = torch.from_numpy(embeddings).to(self.model.device)
+
+    def _fingerprint(self) -> str:
+        """Хэш модели, префикса и текстов сегментов: сохраненный индекс подходит, только если он совпадает"""
+        digest = hashlib.sha256(f"{self.model_name}\0{self.document_prefix}".encode("utf-8"))
+        for segment in self.segments:
+            digest.update(hashlib.sha256(segment.encode("utf-8")).digest())
+        return digest.hexdigest()
+
+    def build_query(self, slide, index: int) -> str:
         raise NotImplementedError()
 
+    def search(self, queries: list[str], limit: Optional[int] = None) -> list[list[Hit]]:
+        """Лучшие сегменты для каждого запроса по убыванию близости. limit больше числа сегментов урезается"""
+        k = min(limit or self.limit, len(self.segments))
+        if not queries or k == 0:
+            return [[] for _ in queries]
+
+        if self.mode == "lexical":
+            return self._search_lexical(queries, k)
+        if self.mode == "hybrid":
+            return self._search_hybrid(queries, k)
+        if self.index is not None:
+            return self._search_index(queries, k)
+
+        query_embeddings = self.model.encode(queries, convert_to_tensor=True).to(self.segments_embeddings.device)
+        block = max(1, self.max_scores // len(self.segments))
+
+        hits = []
+        for first in range(0, len(queries), block):
+            scores = query_embeddings[first:first + block] @ self.segments_embeddings.T
+            values, indices = torch.topk(scores, k=k, dim=1)
+            for row_values, row_indices in zip(values.tolist(), indices.tolist()):
+                hits.append([self._hit(index, score) for index, score in zip(row_indices, row_values)])
+        return hits
+
+    def _search_index(self, queries: list[str], k: int) -> list[list[Hit]]:
+        query_embeddings = np.asarray(self.model.encode(queries, convert_to_numpy=True), dtype=np.float32)
+        scores, indices = self.index.search(query_embeddings, k)
+        return [[self._hit(index, score) for index, score in zip(row_indices, row_scores) if index >= 0]
+                for row_indices, row_scores in zip(indices.tolist(), scores.tolist())]
+
+    def _hit(self, index: int, score: float) -> Hit:
+        return Hit(index, score, self.spans[index] if self.spans is not None else None)
+
+    def _fill(self, indices: np.ndarray, k: int) -> np.ndarray:
+        """Дополняет номера до k первыми по порядку документа сегментами, которых среди них нет"""
+        if indices.size >= k:
+            return indices
+        rest = np.setdiff1d(np.arange(min(k + indices.size, len(self.segments))), indices)
+        return np.concatenate((indices, rest[:k - indices.size]))
+
+    def _search_lexical(self, queries: list[str], k: int) -> list[list[Hit]]:
+        """Лучшие по BM25 сегменты, недостающие до k - сегменты без совпадений с нулевой оценкой"""
+        hits = []
+        for query in queries:
+            matched, scores = self.lexical.top(query, k)
+            indices = self._fill(matched, k)
+            scores = np.concatenate((scores, np.zeros(indices.size - matched.size)))
+            hits.append([self._hit(index, score) for index, score in zip(indices.tolist(), scores.tolist())])
+        return hits
+
+    def _search_hybrid(self, queries: list[str], k: int) -> list[list[Hit]]:
+        """Плотная переоценка лексических кандидатов. Кодируется только объединение кандидатов всех запросов,
+           запрос, у которого кандидатов меньше k, переоценивает все объединение. Объединение меньше k
+           дополняется первыми сегментами документа. Если лексических совпадений нет ни у одного запроса,
+           выполняется плотный поиск по всем сегментам"""
+        candidates = [self.lexical.top(query, self.prefilter)[0] for query in queries]
+        union = np.unique(np.concatenate(candidates))
+        union = np.arange(len(self.segments)) if union.size == 0 else np.sort(self._fill(union, k))
+
+        embeddings = encode_documents(self.model, self.model_name, [self.segments[i] for i in union],
+                                      self.document_prefix)
+        query_embeddings = np.asarray(self.model.encode(queries, convert_to_numpy=True), dtype=np.float32)
+
+        hits = []
+        for query_embedding, query_candidates in zip(query_embeddings, candidates):
+            if query_candidates.size < k:
+                query_candidates = union
+            scores = embeddings[np.searchsorted(union, query_candidates)] @ query_embedding
+            best = np.argsort(-scores, kind="stable")[:k]
+            hits.append([self._hit(index, score)
+                         for index, score in zip(query_candidates[best].tolist(), scores[best].tolist())])
+        return hits
+
+    def retrieve_relevant_hits(self, slides: list, limit: Optional[int] = None) -> list[list[Hit]]:
+        return self.search([self.build_query(slide, i) for i, slide in enumerate(slides)], limit)
+
+    def retrieve_relevant_indices(self, slides: list, limit: Optional[int] = None) -> list[list[int]]:
+        """Номера релевантных сегментов для каждого слайда в порядке документа"""
+        return [sorted(hit.index for hit in hits) for hits in self.retrieve_relevant_hits(slides, limit)]
+
+    def retrieve_relevant_segments(self, slides: list, limit: Optional[int] = None) -> list[str]:
+        return [" ".join(self.segments[idx] for idx in indices)
+                for indices in self.retrieve_relevant_indices(slides, limit)]
+
     def clear(self):
-        raise NotImplementedError()
+        """Отпускает модель, саму модель реестр выгрузит после простоя. Пока ретривер ее держит,
+           реестр ее не выгружает, поэтому clear нужно вызвать, когда поиск больше не нужен"""
+        if self.model is not None:
+            release_model(self.model)
+            self.model = None
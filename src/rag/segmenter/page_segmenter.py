@@ -1,18 +1,20 @@
-import nltk
-from nltk.tokenize import sent_tokenize
+from typing import Iterator, Union
+
+from text_recognition.document import Document
 from .segmenter import Segmenter
 
 class PageSegmenter(Segmenter):
-    def __init__(self, data: str):
+    def __init__(self, data: Union[str, Document]):
         super().__init__(data)
 
-    def split(self) -> list[str]:
+    def spans(self) -> Iterator[tuple[int, int]]:
         page_size_chars = 2100
         overlap = 90
         
         tables = self._extract_tables()
         
-        chunks = []
+        # интервал отдается на шаг позже: короткий последний кусок присоединяется к предыдущему
+        previous = None
         start = 0
 
         while start <= len(self.data):
@@ -23,29 +25,32 @@ class PageSegmenter(Segmenter):
             
             if adjusted_end != end:
                 end = adjusted_end
-                window = self.data[start:end]
+                span = (start, min(end, len(self.data)))
                 start = end
             else:
-                last_period = self.data[end:].find('.')
-                if last_period != -1 and last_period < 1.5 * overlap:
-                        end += last_period + 1
+                sentence_end = self.document.sentence_end_after(end)
+                if sentence_end is not None and sentence_end - end < 1.5 * overlap:
+                        end = sentence_end
                 
-                window = self.data[start:end]
+                span = (start, min(end, len(self.data)))
 
                 start = end - overlap // 2
-                first_period = self.data[:start].rfind('.')
-                if first_period != -1 and (start - first_period) < overlap:
-                    start = first_period + 1
+                sentence_start = self.document.sentence_start_before(start)
+                if sentence_start is not None and (start - sentence_start) < overlap:
+                    start = sentence_start
                 else:
                     start = end + 1
 
-            chunks.append(window)
-        
-        if len(chunks) > 1 and len(chunks[-1]) <= 500:
-            last_chunk = chunks.pop()
-            chunks[-1] += last_chunk
+            if start > len(self.data) and previous is not None and span[1] - span[0] <= 500:
+                previous = (previous[0], span[1])
+                continue
 
-        return chunks
+            if previous is not None:
+                yield previous
+            previous = span
+        
+        if previous is not None:
+            yield previous
     
     def _extract_tables(self) -> list[tuple[int, int]]:
         tables = []
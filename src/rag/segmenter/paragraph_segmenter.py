@@ -1,28 +1,24 @@
+from typing import Iterator, Union
+
+from text_recognition.document import Document
 from .segmenter import Segmenter
-import nltk
 
 class ParagraphSegmenter(Segmenter):
-    def __init__(self, data: str, min_sentences: int = 4):
+    def __init__(self, data: Union[str, Document], min_sentences: int = 4):
         super().__init__(data)
         self.min_sentences = min_sentences
-    
-    def split(self) -> list[str]:
-        paragraphs = self.data.split('\n\n')
-        
-        cleaned_paragraphs = []
-        for paragraph in paragraphs:
-            paragraph = paragraph.strip()
-            if paragraph and not paragraph.isspace():
-                cleaned_paragraphs.append(paragraph)
-        
-        merged_paragraphs = []
-        for paragraph in cleaned_paragraphs:
-            sentences = nltk.sent_tokenize(paragraph)
-            
-            if (len(merged_paragraphs) > 0 and 
-                len(sentences) < self.min_sentences):
-                merged_paragraphs[-1] += "\n\n" + paragraph
+
+    def spans(self) -> Iterator[tuple[int, int]]:
+        """Абзацы документа, короткие абзацы (меньше min_sentences предложений) присоединяются к предыдущему"""
+        current = None
+        for start, end in self.document.blocks:
+            if (current is not None and 
+                self.document.sentence_count(start, end) < self.min_sentences):
+                current = (current[0], end)
             else:
-                merged_paragraphs.append(paragraph)
+                if current is not None:
+                    yield current
+                current = (start, end)
         
-        return merged_paragraphs
\ No newline at end of file
+        if current is not None:
+            yield current
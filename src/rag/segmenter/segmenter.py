@@ -1,6 +1,31 @@
+from typing import Iterator, Optional, Union
+
+from text_recognition.document import Document
+
 class Segmenter:
-    def __init__(self, data: str):
-        self.data = data
+    """Базовый сегментатор. Наследник переопределяет spans или split: spans лениво отдает интервалы
+       (start, end) сегментов в тексте документа, строки сегментов создаются только в split и texts"""
+
+    def __init__(self, data: Union[str, Document]):
+        self.document = data if isinstance(data, Document) else Document(data)
+        self.data = self.document.text
 
     def split(self) -> list[str]:
-        raise NotImplementedError()
\ No newline at end of file
+        return list(self.texts())
+
+    def texts(self) -> Iterator[str]:
+        """Тексты сегментов по одному, без списка всех сегментов сразу"""
+        for start, end in self.spans():
+            yield self.data[start:end]
+
+    def spans(self) -> Iterator[Optional[tuple[int, int]]]:
+        """Интервалы (start, end) сегментов в тексте документа, по одному на сегмент split.
+           По умолчанию сегменты ищутся в тексте по порядку, для сегментов, которых нет в тексте дословно, - None"""
+        cursor = 0
+        for segment in self.split():
+            start = self.data.find(segment, cursor)
+            if start == -1:
+                yield None
+                continue
+            yield start, start + len(segment)
+            cursor = start + 1
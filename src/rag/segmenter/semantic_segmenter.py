@@ -1,90 +1,100 @@
-from transformers import AutoTokenizer
+from collections import deque
+from itertools import chain
 import numpy as np
-from sklearn.cluster import AgglomerativeClustering
-from typing import List
-from sentence_transformers import SentenceTransformer
-from nltk.tokenize import sent_tokenize
-from sklearn.metrics.pairwise import cosine_distances
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
 from tqdm import tqdm
 
+from rag.embeddings.registry import acquire_model, release_model
+from text_recognition.document import Document
 from .segmenter import Segmenter
 
 class SemanticSegmenter(Segmenter):
-    def __init__(self, data: str, model_name: str = 'ai-forever/FRIDA'):
-        super().__init__(data)
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = SentenceTransformer(model_name)
-
-    def split(self) -> List[str]:
-        sentences = sent_tokenize(self.data)
-
-        chunks = []
-        batch_size = 500
+    """Смысловые сегменты в духе TextTiling. Для каждой границы между предложениями считается близость
+       средних эмбеддингов window предложений слева и справа, сегменты режутся в локальных минимумах близости
+       глубиной не меньше min_depth. Эмбеддинги считаются пачками по ходу текста, в памяти остаются только
+       последние окна, поэтому время линейное, а память не зависит от длины документа"""
 
-        for i in tqdm(range(0, len(sentences), batch_size), desc="split"):
-            batch_sentences = sentences[i:i + batch_size]
-            embeddings = self.get_sentence_embeddings(batch_sentences)
-            batch_clusters = self.cluster_sentences(batch_sentences, embeddings)
-            batch_chunks = self.merge_clusters(batch_clusters)
-            chunks.extend(batch_chunks)
-
-        return chunks
+    def __init__(self, data: Union[str, Document], model_name: str = 'ai-forever/FRIDA', window: int = 3,
+                 min_depth: float = 0.1, min_sentences: int = 2, max_chars: int = 1500, batch_size: int = 256):
+        super().__init__(data)
+        self.model = acquire_model(model_name)
+        self.window = window
+        self.min_depth = min_depth
+        self.min_sentences = min_sentences
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+
+    def spans(self) -> Iterator[Tuple[int, int]]:
+        starts, ends = self.document.sentence_bounds()
+        if not starts:
+            return
+
+        first = 0
+        for gap, boundary in self._boundaries(starts, ends):
+            start = starts[first]
+            too_long = ends[gap] - start > self.max_chars
+            if (boundary and gap - first >= self.min_sentences) or too_long:
+                yield start, ends[gap - 1]
+                first = gap
+
+        yield starts[first], ends[-1]
+
+    def clear(self):
+        """Отпускает модель, реестр выгрузит ее после простоя"""
+        if self.model is not None:
+            release_model(self.model)
+            self.model = None
 
     def get_sentence_embeddings(self, sentences: List[str]) -> np.ndarray:
-        embeddings = self.model.encode(sentences, convert_to_tensor=False)
+        embeddings = self.model.encode(sentences, convert_to_tensor=False, normalize_embeddings=True)
 
         return embeddings
 
-    def cluster_sentences(self, sentences: List[str], embeddings: np.ndarray,
-                          threshold: float = 0.7) -> List[List[str]]:
-        if len(sentences) <= 3:
-            return [sentences]
-
-        # cosine_sim = np.dot(embeddings, embeddings.T)
-
-        # distance = 1 - cosine_sim
-
-        distance = cosine_distances(embeddings)
-
-        clustering = AgglomerativeClustering(
-            n_clusters=None,
-            distance_threshold=threshold,
-            metric='precomputed',
-            linkage='average'
-        )
-
-        labels = clustering.fit_predict(distance)
-
-        clusters = {}
-        for i, label in enumerate(labels):
-            if label not in clusters:
-                clusters[label] = []
-            clusters[label].append(sentences[i])
-
-        return list(clusters.values())
-
-    def merge_clusters(self, clusters: List[List[str]]) -> List[str]:
-        chunks = []
-
-        for cluster in tqdm(clusters, desc="Merge clasters"):
-            chunk = " ".join(cluster)
-            if len(chunk) > 500:
-                sentences = cluster
-                current_part = []
-                current_length = 0
-
-                for sentence in sentences:
-                    if current_length + len(sentence) > 500 and current_part:
-                        chunks.append(" ".join(current_part))
-                        current_part = [sentence]
-                        current_length = len(sentence)
-                    else:
-                        current_part.append(sentence)
-                        current_length += len(sentence)
-
-                if current_part:
-                    chunks.append(" ".join(current_part))
-            else:
-                chunks.append(chunk)
-
-        return chunks
\ No newline at end of file
+    def _embeddings(self, starts: Sequence[int], ends: Sequence[int]) -> Iterator[np.ndarray]:
+        for i in tqdm(range(0, len(starts), self.batch_size), desc="split"):
+            batch = zip(starts[i:i + self.batch_size], ends[i:i + self.batch_size])
+            yield from self.get_sentence_embeddings([self.data[start:end] for start, end in batch])
+
+    def _gap_scores(self, starts: Sequence[int], ends: Sequence[int]) -> Iterator[Tuple[int, Optional[float]]]:
+        """Близость соседних окон для каждой границы: граница gap стоит перед предложением gap.
+           У границ ближе window предложений к краю документа полных окон нет, для них None"""
+        w = self.window
+        n = len(starts)
+        vectors = deque(maxlen=2 * w)
+
+        for gap in range(1, min(w, n)):
+            yield gap, None
+
+        for seen, vector in enumerate(self._embeddings(starts, ends), 1):
+            vectors.append(vector)
+            if seen >= 2 * w:
+                window = np.asarray(vectors)
+                left, right = window[:w].sum(axis=0), window[w:].sum(axis=0)
+                norm = np.linalg.norm(left) * np.linalg.norm(right)
+                yield seen - w, float(left @ right / norm) if norm else 0.0
+
+        for gap in range(max(w, n - w + 1), n):
+            yield gap, None
+
+    def _boundaries(self, starts: Sequence[int], ends: Sequence[int]) -> Iterator[Tuple[int, bool]]:
+        """Для каждой границы - является ли она локальным минимумом близости среди window соседних границ
+           с каждой стороны с глубиной (подъемы слева и справа) не меньше min_depth"""
+        w = self.window
+        padding = [(None, None)] * w
+        neighbourhood = deque(padding, maxlen=2 * w + 1)
+
+        for item in chain(self._gap_scores(starts, ends), padding):
+            neighbourhood.append(item)
+            if len(neighbourhood) < neighbourhood.maxlen:
+                continue
+            gap, score = neighbourhood[w]
+            if gap is None:
+                continue
+
+            scores = [s for _, s in neighbourhood]
+            left = [s for s in scores[:w] if s is not None]
+            right = [s for s in scores[w + 1:] if s is not None]
+            boundary = (score is not None and bool(left) and bool(right) and
+                        score < min(left) and score <= min(right) and
+                        (max(left) - score) + (max(right) - score) >= self.min_depth)
+            yield gap, boundary
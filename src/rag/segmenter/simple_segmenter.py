@@ -1,11 +1,12 @@
-import nltk
-from nltk.tokenize import sent_tokenize
+from typing import Iterator, Union
+
+from text_recognition.document import Document
 from .segmenter import Segmenter
 
 
 class SimpleSegmenter(Segmenter):
-    def __init__(self, data: str):
+    def __init__(self, data: Union[str, Document]):
         super().__init__(data)
 
-    def split(self) -> list[str]:
-        return sent_tokenize(self.data)
\ No newline at end of file
+    def spans(self) -> Iterator[tuple[int, int]]:
+        yield from zip(*self.document.sentence_bounds())
@@ -1,30 +1,85 @@
-import nltk
-from nltk.tokenize import sent_tokenize
+from functools import lru_cache
+from typing import Iterator, Optional, Union
+
+import numpy as np
+from tokenizers import Tokenizer
+
+from text_recognition.document import Document
 from .segmenter import Segmenter
 
+@lru_cache(maxsize=None)
+def load_tokenizer(name: str) -> Tokenizer:
+    """Токенизатор загружается один раз на процесс"""
+    return Tokenizer.from_pretrained(name)
+
 class WindowSegmenter(Segmenter):
-    def __init__(self, data: str):
+    """Окна текста для планирования слайдов. По умолчанию окна по 15000 символов с перекрытием 1100.
+       Если задан max_tokens, окна считаются в токенах модели: каждое окно заполняется целыми предложениями
+       до бюджета max_tokens за вычетом промпта prompt и запаса reserve_tokens (например, под релевантные
+       сегменты), так что документ укладывается в наименьшее число вызовов LLM"""
+
+    def __init__(self, data: Union[str, Document], max_tokens: Optional[int] = None, overlap_tokens: int = 300,
+                 prompt: str = "", reserve_tokens: int = 0, tokenizer_name: str = 'ai-forever/FRIDA'):
         super().__init__(data)
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.prompt = prompt
+        self.reserve_tokens = reserve_tokens
+        self.tokenizer_name = tokenizer_name
+
+    def spans(self) -> Iterator[tuple[int, int]]:
+        if self.max_tokens is not None:
+            yield from self._token_spans()
+            return
 
-    def split(self) -> list[str]:
         window_size_chars=15000
         overlap=1100
 
-        chunks = []
         start = 0
-        
+
         while start < len(self.data):
             end = start + window_size_chars
-            window = self.data[start:end]
-            
-            last_period = window.rfind('.')
-            if last_period > window_size_chars * 0.8: 
-                window = window[:last_period + 1]
-                end = start + len(window)
-            
-            chunks.append(window)
-            start = end - overlap
-            start = start + window[start:].rfind('.')
-            # TODO if source document do not contain dots for some reason, use \n instead
-        
-        return chunks
\ No newline at end of file
+
+            sentence_end = self.document.sentence_end_before(end)
+            if sentence_end is not None and sentence_end - start > window_size_chars * 0.8:
+                end = sentence_end
+
+            yield start, min(end, len(self.data))
+            if end >= len(self.data):
+                break
+            # следующее окно начинается с первого предложения в перекрытии
+            next_start = self.document.sentence_start_after(end - overlap)
+            start = next_start if next_start is not None and next_start < end else end - overlap
+
+    def count_tokens(self, texts: list[str]) -> np.ndarray:
+        tokenizer = load_tokenizer(self.tokenizer_name)
+        encodings = tokenizer.encode_batch(texts, add_special_tokens=False)
+        return np.array([len(encoding.ids) for encoding in encodings], dtype=np.int64)
+
+    def _token_spans(self, batch_size: int = 1000) -> Iterator[tuple[int, int]]:
+        """Окна из целых предложений по бюджету токенов. Границы окон ищутся двоичным поиском
+           по префиксным суммам токенов предложений; предложение длиннее бюджета становится отдельным окном"""
+        budget = self.max_tokens - self.reserve_tokens
+        if self.prompt:
+            budget -= int(self.count_tokens([self.prompt])[0])
+        if budget <= 0:
+            raise ValueError(f"Промпт и запас не оставляют токенов для текста: max_tokens={self.max_tokens}")
+
+        starts, ends = self.document.sentence_bounds()
+        if not starts:
+            return
+
+        counts = np.concatenate([self.count_tokens([self.data[start:end] for start, end in
+                                                    zip(starts[i:i + batch_size], ends[i:i + batch_size])])
+                                 for i in range(0, len(starts), batch_size)])
+        prefix = np.concatenate(([0], np.cumsum(counts)))
+
+        first = 0
+        while first < len(starts):
+            last = max(first + 1, int(np.searchsorted(prefix, prefix[first] + budget, side="right")) - 1)
+            yield starts[first], ends[last - 1]
+            if last >= len(starts):
+                break
+            # перекрытие - последние предложения окна, которые укладываются в overlap_tokens
+            overlap_first = int(np.searchsorted(prefix, prefix[last] - self.overlap_tokens, side="left"))
+            first = max(first + 1, overlap_first)
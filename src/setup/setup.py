@@ -1,8 +1,12 @@
 import nltk
 
+from text_recognition.document import sentence_tokenizer
+
 
 def setup():
     try:
         nltk.data.find('tokenizers/punkt_tab')
     except LookupError:
-        nltk.download('punkt_tab')
\ No newline at end of file
+        nltk.download('punkt_tab')
+    # модель Punkt загружается заранее, документы используют ее готовой
+    sentence_tokenizer()
\ No newline at end of file
@@ -9,11 +9,12 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from rag.segmenter.window_segmenter import WindowSegmenter
 from rag.segmenter.paragraph_segmenter import ParagraphSegmenter
-from rag.presentation_gen.slide_generation import create_presentation_plan, generate_slide_descriptions_with_context
+from rag.presentation_gen.slide_generation import build_chunk_prompt, create_presentation_plan, generate_slide_descriptions_with_context
 from rag.retriever.paragraph_retriever import ParagraphRetriever
 from rag.presentation_gen.build_presentation import build_presentation
 from visgen.simple_enchancer import enhance_slides_with_visualizations
 from text_recognition.pdf_to_text import pdf_to_text
+from text_recognition.ocr_cache import get_cache
 
 
 def process_pdf_to_presentation(pdf_path: str, output_dir: str = None) -> str:
@@ -23,6 +24,16 @@ def process_pdf_to_presentation(pdf_path: str, output_dir: str = None) -> str:
     OPENROUTER_API_KEY = os.getenv("API_KEY")
     if not OPENROUTER_API_KEY:
         raise ValueError("API_KEY не найден в переменных окружения")
+
+    ocr_workers = int(os.getenv("OCR_WORKERS", "1"))
+    ocr_dpi = int(os.getenv("OCR_DPI", "200"))
+    ocr_escalate_dpi = int(os.getenv("OCR_ESCALATE_DPI")) if os.getenv("OCR_ESCALATE_DPI") else None
+    # кэш создается один раз на процесс: при создании он обходит всю папку
+    ocr_cache = get_cache()
+    ocr_lang = os.getenv("OCR_LANG", "rus+eng")
+    # с PLAN_MAX_TOKENS окна набираются по бюджету токенов с учетом промпта и места под релевантные сегменты
+    plan_max_tokens = int(os.getenv("PLAN_MAX_TOKENS")) if os.getenv("PLAN_MAX_TOKENS") else None
+    plan_reserve_tokens = int(os.getenv("PLAN_RESERVE_TOKENS", "2000"))
     
     if output_dir is None:
         output_dir = tempfile.mkdtemp(prefix="presentation_")
@@ -30,18 +41,29 @@ def process_pdf_to_presentation(pdf_path: str, output_dir: str = None) -> str:
         os.makedirs(output_dir, exist_ok=True)
     
     try:
-        text, images_dict = pdf_to_text(pdf_path)
+        document, images_dict = pdf_to_text(pdf_path, workers=ocr_workers, cache=ocr_cache,
+                                            dpi=ocr_dpi, escalate_dpi=ocr_escalate_dpi, languages=ocr_lang)
         
-        window_segmenter = WindowSegmenter(text)
+        window_segmenter = WindowSegmenter(document, max_tokens=plan_max_tokens, prompt=build_chunk_prompt("", 0, 1),
+                                           reserve_tokens=plan_reserve_tokens)
         chunks = window_segmenter.split()
         
-        segmenter = ParagraphSegmenter(text)
-        segments = segmenter.split()
+        segmenter = ParagraphSegmenter(document)
+        segment_spans = list(segmenter.spans())
+        segments = [document.span_text(span) for span in segment_spans]
+        # маркеры картинок каждого сегмента находятся один раз по индексу якорей документа
+        segment_markers = [[marker for marker in document.markers_in(*span) if marker in images_dict]
+                           for span in segment_spans]
         
-        retriever = ParagraphRetriever(segments)
-        temp_slides = create_presentation_plan(chunks, OPENROUTER_API_KEY)
-        relevant_segments = retriever.retrieve_relevant_segments(temp_slides)
-        retriever.clear()
+        # RETRIEVAL_MODE: dense (по умолчанию), hybrid (BM25-кандидаты переоцениваются моделью) или lexical (только BM25)
+        retriever = ParagraphRetriever(segments, segment_spans, mode=os.getenv("RETRIEVAL_MODE", "dense"))
+        try:
+            temp_slides = create_presentation_plan(chunks, OPENROUTER_API_KEY)
+            relevant_indices = retriever.retrieve_relevant_indices(temp_slides)
+        finally:
+            # модель держится ретривером и не выгружается реестром, пока ее не отпустят
+            retriever.clear()
+        relevant_segments = [" ".join(segments[idx] for idx in indices) for indices in relevant_indices]
         
         slides = create_presentation_plan(chunks, OPENROUTER_API_KEY, relevant_segments)
         
@@ -49,26 +71,23 @@ def process_pdf_to_presentation(pdf_path: str, output_dir: str = None) -> str:
         os.makedirs(extracted_images_dir, exist_ok=True)
         
         enhanced_slides = []
-        for i, (slide, segment) in enumerate(zip(slides, relevant_segments)):
-            slide_has_image = False
-            for img_marker in images_dict.keys():
-                if img_marker in segment:
-                    img_filename = f"slide_{i+1}_{img_marker.replace('[', '').replace(']', '').lower()}.png"
-                    img_path = os.path.join(extracted_images_dir, img_filename)
-                    images_dict[img_marker].save(img_path)
-                    
-                    slide_with_image = slide.copy()
-                    slide_with_image["visualization"] = {
-                        "needed": True,
-                        "type": "extracted_image",
-                        "image_path": img_path,
-                        "chart_title": f"Изображение {img_marker}"
-                    }
-                    enhanced_slides.append(slide_with_image)
-                    slide_has_image = True
-                    break
-            
-            if not slide_has_image:
+        for i, (slide, indices) in enumerate(zip(slides, relevant_indices)):
+            slide_markers = [marker for idx in indices for marker in segment_markers[idx]]
+            if slide_markers:
+                img_marker = min(slide_markers, key=document.position)
+                img_filename = f"slide_{i+1}_{img_marker.replace('[', '').replace(']', '').lower()}{images_dict[img_marker].extension}"
+                img_path = os.path.join(extracted_images_dir, img_filename)
+                images_dict[img_marker].save(img_path)
+
+                slide_with_image = slide.copy()
+                slide_with_image["visualization"] = {
+                    "needed": True,
+                    "type": images_dict[img_marker].vis_type,
+                    "image_path": img_path,
+                    "chart_title": f"Изображение {img_marker}"
+                }
+                enhanced_slides.append(slide_with_image)
+            else:
                 enhanced_slides.append(slide)
         
         slides_without_images = []
@@ -0,0 +1,140 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Optional
+
+from nltk.tokenize.punkt import PunktTokenizer
+
+MARKER_PATTERN = re.compile(r"\[IMAGE_(\d+)\]")
+BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+
+@lru_cache(maxsize=None)
+def sentence_tokenizer(language: str = "english") -> PunktTokenizer:
+    """Модель Punkt загружается один раз на процесс"""
+    return PunktTokenizer(language)
+
+class Document:
+    """Распознанный документ: весь текст одной строкой и разметка поверх нее в виде интервалов (start, end)
+       по позициям в тексте - страницы, блоки (абзацы между пустыми строками), предложения и якоря картинок.
+       Индекс маркер -> позиция и отсортированные позиции якорей позволяют искать картинки внутри
+       любого интервала двоичным поиском, без поиска подстрок"""
+
+    def __init__(self, text: str, pages: list[tuple[int, int]] = None):
+        self.text = text
+        self.pages = pages if pages is not None else [(0, len(text))]
+        self._page_starts = [start for start, _ in self.pages]
+        self.blocks = self._find_blocks()
+        occurrences = [(match.start(), match.end(), match.group(0)) for match in MARKER_PATTERN.finditer(text)]
+        # маркер повторенной страницы встречается несколько раз, индекс хранит первое вхождение
+        self.anchors = {}
+        for start, end, marker in occurrences:
+            self.anchors.setdefault(marker, (start, end))
+        self._anchor_starts = [start for start, _, _ in occurrences]
+        self._anchor_ends = [end for _, end, _ in occurrences]
+        self._anchor_markers = [marker for _, _, marker in occurrences]
+        self._sentence_starts = None
+        self._sentence_ends = None
+
+    @classmethod
+    def from_pages(cls, pages: list[str]) -> "Document":
+        """Документ из текстов страниц, склеенных подряд"""
+        spans = []
+        position = 0
+        for page in pages:
+            spans.append((position, position + len(page)))
+            position += len(page)
+        return cls("".join(pages), spans)
+
+    def _find_blocks(self) -> list[tuple[int, int]]:
+        blocks = []
+        start = 0
+        for separator in BLOCK_SEPARATOR.finditer(self.text):
+            if self.text[start:separator.start()].strip():
+                blocks.append(self._strip(start, separator.start()))
+            start = separator.end()
+        if self.text[start:].strip():
+            blocks.append(self._strip(start, len(self.text)))
+        return blocks
+
+    def _strip(self, start: int, end: int) -> tuple[int, int]:
+        """Интервал без пробельных символов по краям"""
+        fragment = self.text[start:end]
+        return start + len(fragment) - len(fragment.lstrip()), end - len(fragment) + len(fragment.rstrip())
+
+    def _sentence_index(self) -> tuple[array, array]:
+        """Начала и концы предложений внутри блоков в компактных массивах, считаются при первом обращении.
+           Предложения не пересекают границы блоков и идут по порядку, поэтому оба массива отсортированы"""
+        if self._sentence_starts is None:
+            tokenizer = sentence_tokenizer()
+            self._sentence_starts, self._sentence_ends = array("q"), array("q")
+            for start, end in self.blocks:
+                for sentence_start, sentence_end in tokenizer.span_tokenize(self.text[start:end]):
+                    self._sentence_starts.append(start + sentence_start)
+                    self._sentence_ends.append(start + sentence_end)
+        return self._sentence_starts, self._sentence_ends
+
+    def sentence_bounds(self) -> tuple[array, array]:
+        """Начала и концы предложений без копирования: для прохода по всем предложениям без списка интервалов"""
+        return self._sentence_index()
+
+    @property
+    def sentences(self) -> list[tuple[int, int]]:
+        """Интервалы предложений внутри блоков. Список строится заново при каждом обращении"""
+        return list(zip(*self._sentence_index()))
+
+    def sentence_end_before(self, position: int) -> Optional[int]:
+        """Ближайший конец предложения не правее позиции или None"""
+        ends = self._sentence_index()[1]
+        i = bisect_right(ends, position)
+        return ends[i - 1] if i else None
+
+    def sentence_end_after(self, position: int) -> Optional[int]:
+        """Ближайший конец предложения не левее позиции или None"""
+        ends = self._sentence_index()[1]
+        i = bisect_left(ends, position)
+        return ends[i] if i < len(ends) else None
+
+    def sentence_start_before(self, position: int) -> Optional[int]:
+        """Ближайшее начало предложения не правее позиции или None"""
+        starts = self._sentence_index()[0]
+        i = bisect_right(starts, position)
+        return starts[i - 1] if i else None
+
+    def sentence_start_after(self, position: int) -> Optional[int]:
+        """Ближайшее начало предложения не левее позиции или None"""
+        starts = self._sentence_index()[0]
+        i = bisect_left(starts, position)
+        return starts[i] if i < len(starts) else None
+
+    def sentence_count(self, start: int, end: int) -> int:
+        """Число предложений, начинающихся в интервале [start, end)"""
+        starts = self._sentence_index()[0]
+        return bisect_left(starts, end) - bisect_left(starts, start)
+
+    def span_text(self, span: tuple[int, int]) -> str:
+        start, end = span
+        return self.text[start:end]
+
+    def page_of(self, position: int) -> int:
+        """Номер страницы (с нуля), на которую приходится позиция текста"""
+        return max(0, bisect_right(self._page_starts, position) - 1)
+
+    def markers_in(self, start: int, end: int) -> list[str]:
+        """Маркеры картинок, якоря которых целиком лежат в интервале [start, end), в порядке документа"""
+        first = bisect_left(self._anchor_starts, start)
+        last = bisect_left(self._anchor_starts, end)
+        markers = (marker for marker, marker_end in zip(self._anchor_markers[first:last], self._anchor_ends[first:last])
+                   if marker_end <= end)
+        return list(dict.fromkeys(markers))
+
+    def position(self, marker: str) -> Optional[int]:
+        """Позиция маркера в тексте или None, если его нет"""
+        span = self.anchors.get(marker)
+        return span[0] if span else None
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __str__(self) -> str:
+        return self.text
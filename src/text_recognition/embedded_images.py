@@ -0,0 +1,209 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+# кодировки, которые pdfimages -all сохраняет файлами, понятными python-pptx
+EXTENSIONS = {"jpeg": ".jpg", "image": ".png"}
+
+def has_pdfimages_support() -> bool:
+    """Проверяет, установлен ли pdfimages из poppler"""
+    return shutil.which("pdfimages") is not None
+
+def has_pdftohtml_support() -> bool:
+    """Проверяет, установлен ли pdftohtml из poppler"""
+    return shutil.which("pdftohtml") is not None
+
+def list_embedded_images(pdf_path: str) -> dict[int, list[dict]]:
+    """Встроенные растровые изображения документа по страницам из pdfimages -list, без декодирования.
+       Изображение описывается словарем {"index", "type", "width", "height", "color", "enc", "object",
+       "x_ppi", "y_ppi"}, index - порядковый номер на странице, под которым его сохраняет pdfimages,
+       object - номер объекта pdf (одна картинка, выведенная несколько раз, имеет один номер)"""
+    result = subprocess.run(["pdfimages", "-list", pdf_path], capture_output=True, check=True, text=True)
+
+    pages = {}
+    for line in result.stdout.splitlines()[2:]:
+        fields = line.split()
+        if len(fields) < 14:
+            continue
+        try:
+            page_number = int(fields[0])
+            image = {
+                "type": fields[2],
+                "width": int(fields[3]),
+                "height": int(fields[4]),
+                "color": fields[5],
+                "enc": fields[8],
+                "object": int(fields[10]),
+                "x_ppi": float(fields[12]),
+                "y_ppi": float(fields[13]),
+            }
+        except ValueError:
+            continue
+        page = pages.setdefault(page_number, [])
+        image["index"] = len(page)
+        page.append(image)
+
+    return pages
+
+def list_image_positions(pdf_path: str, page_number: int) -> list[tuple[float, float, float, float]]:
+    """Положения (left, top, width, height) изображений страницы в пунктах от левого верхнего угла
+       в порядке вывода на страницу, из pdftohtml -xml"""
+    with tempfile.TemporaryDirectory() as tmp:
+        page = str(page_number)
+        subprocess.run(["pdftohtml", "-xml", "-q", "-zoom", "1", "-f", page, "-l", page, pdf_path,
+                        os.path.join(tmp, "page")], capture_output=True, check=True)
+        root = ET.parse(os.path.join(tmp, "page.xml")).getroot()
+    return [tuple(float(image.get(key)) for key in ("left", "top", "width", "height")) for image in root.iter("image")]
+
+@lru_cache(maxsize=2)
+def _extract_page(pdf_path: str, page_number: int) -> dict[int, bytes]:
+    """Байты всех изображений страницы в исходной кодировке. Кэш на две страницы, как у растрирования"""
+    with tempfile.TemporaryDirectory() as tmp:
+        page = str(page_number)
+        subprocess.run(["pdfimages", "-all", "-f", page, "-l", page, pdf_path, os.path.join(tmp, "img")],
+                       capture_output=True, check=True)
+        images = {}
+        for name in os.listdir(tmp):
+            with open(os.path.join(tmp, name), "rb") as file:
+                images[int(os.path.splitext(name)[0].split("-")[-1])] = file.read()
+        return images
+
+class EmbeddedImage:
+    """Ссылка на изображение, встроенное в pdf. Байты достаются из файла как есть, без растрирования страницы
+       и перекодирования, поэтому в презентацию попадает оригинал"""
+    vis_type = "extracted_image"
+
+    def __init__(self, pdf_path: str, page_number: int, info: dict, box: tuple[int, int, int, int] = None):
+        self.pdf_path = pdf_path
+        self.page_number = page_number
+        self.index = info["index"]
+        self.width = info["width"]
+        self.height = info["height"]
+        self.extension = EXTENSIONS[info["enc"]]
+        self.box = tuple(box) if box is not None else None
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def data(self) -> bytes:
+        return _extract_page(self.pdf_path, self.page_number)[self.index]
+
+    def materialize(self) -> Image.Image:
+        return Image.open(io.BytesIO(self.data()))
+
+    def save(self, path: str):
+        with open(path, "wb") as file:
+            file.write(self.data())
+
+    def __repr__(self) -> str:
+        return f"EmbeddedImage(page={self.page_number}, index={self.index}, size={self.size}, extension={self.extension})"
+
+def _is_extractable(image: dict) -> bool:
+    return (image["type"] == "image" and image["enc"] in EXTENSIONS and image["color"] in ("gray", "rgb", "index")
+            and image["x_ppi"] > 0 and image["y_ppi"] > 0)
+
+def _shown_sizes(images: list[dict], dpi: int) -> np.ndarray:
+    """Размеры (w, h) в пикселях при dpi, с которыми изображения выведены на страницу"""
+    return np.array([(image["width"] / image["x_ppi"] * dpi, image["height"] / image["y_ppi"] * dpi)
+                     for image in images], dtype=np.float64).reshape(-1, 2)
+
+def has_twins(images: list[dict], dpi: int = 200, tolerance: float = 0.15) -> bool:
+    """Есть ли на странице разные изображения, выведенные почти одного размера: по размеру их не различить"""
+    images = [image for image in images if _is_extractable(image)]
+    shown = _shown_sizes(images, dpi)
+    error = (np.abs(shown[:, None, :] - shown[None, :, :]) / shown[None, :, :]).max(axis=2)
+    objects = np.array([image["object"] for image in images])
+    return bool((error <= tolerance)[objects[:, None] != objects[None, :]].any())
+
+def match_embedded_images(images: list[dict], boxes: list, dpi: int = 200, tolerance: float = 0.15,
+                          positions: Optional[list] = None) -> dict[int, dict]:
+    """Сопоставляет рамки областей страницы (x, y, w, h при dpi) со встроенными изображениями по размеру,
+       с которым изображение выведено на страницу (width / x_ppi дюймов). Возвращает {индекс рамки: изображение},
+       каждое изображение достается не больше чем одной рамке. Рамки без пары (векторные рисунки, таблицы,
+       сканы) остаются за вырезанием из растра.
+       positions - положения изображений из list_image_positions, по одному на каждую строку images, кроме
+       масок smask. С ними рамка должна совпасть с изображением и по месту на странице. Если рамке подходят
+       разные изображения (или изображению - больше рамок, чем раз оно выведено), рамка не сопоставляется:
+       порядок компонент страницы не связан с порядком изображений, и картинки можно перепутать"""
+    drawn = [image for image in images if image["type"] != "smask"]
+    if positions is not None and len(positions) != len(drawn):
+        positions = None
+    located = {id(image): position for image, position in zip(drawn, positions or ())}
+
+    images = [image for image in images if _is_extractable(image)]
+    if not images or not len(boxes):
+        return {}
+
+    boxes = np.array([box[:4] for box in boxes], dtype=np.float64)
+    shown = _shown_sizes(images, dpi)
+    # error[i, j]: наибольшее относительное расхождение сторон рамки i и изображения j
+    error = (np.abs(boxes[:, None, 2:] - shown[None, :, :]) / shown[None, :, :]).max(axis=2)
+    if located:
+        # положения в пунктах, расхождение угла считается относительно размера изображения
+        corners = np.array([located[id(image)][:2] for image in images]) * dpi / 72
+        error = np.maximum(error, (np.abs(boxes[:, None, :2] - corners[None, :, :]) / shown[None, :, :]).max(axis=2))
+
+    close = error <= tolerance
+    objects = np.array([image["object"] for image in images])
+    for obj in np.unique(objects):
+        same = objects == obj
+        candidates = close[:, same].any(axis=1)
+        # рамке подходит и другое изображение, либо рамок больше, чем выводов этого изображения
+        ambiguous = candidates & close[:, ~same].any(axis=1)
+        if candidates.sum() > same.sum():
+            ambiguous = candidates
+        error[ambiguous] = np.inf
+
+    matches = {}
+    used = set()
+    for flat in np.argsort(error, axis=None):
+        box_idx, image_idx = (int(v) for v in np.unravel_index(flat, error.shape))
+        if error[box_idx, image_idx] > tolerance:
+            break
+        if box_idx in matches or image_idx in used:
+            continue
+        matches[box_idx] = images[image_idx]
+        used.add(image_idx)
+
+    return matches
+
+class EmbeddedImageIndex:
+    """Список встроенных изображений документа, читается один раз при первом обращении"""
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        self._pages = None
+        self._positions = has_pdftohtml_support()
+
+    def page(self, page_number: int) -> list[dict]:
+        if self._pages is None:
+            try:
+                self._pages = list_embedded_images(self.pdf_path)
+            except subprocess.CalledProcessError:
+                self._pages = {}
+        return self._pages.get(page_number, [])
+
+    def regions(self, page_number: int, boxes: list, start_idx: int = 0, dpi: int = 200) -> dict[str, EmbeddedImage]:
+        """Маркеры рамок страницы, для которых нашлось встроенное изображение, нумерация с start_idx + 1.
+           Положения изображений запрашиваются у pdftohtml, только если по размеру их не различить"""
+        images = self.page(page_number)
+        positions = None
+        if self._positions and len(boxes) and has_twins(images, dpi):
+            try:
+                positions = list_image_positions(self.pdf_path, page_number)
+            except (subprocess.CalledProcessError, OSError, ET.ParseError):
+                positions = None
+        matches = match_embedded_images(images, boxes, dpi, positions=positions)
+        return {
+            f"[IMAGE_{start_idx + box_idx + 1}]": EmbeddedImage(self.pdf_path, page_number, image, boxes[box_idx])
+            for box_idx, image in matches.items()
+        }
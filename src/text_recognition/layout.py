@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+from .region_classifier import RegionClassifier
+
+def to_gray(image) -> np.ndarray:
+    """Переводит страницу или ее фрагмент в оттенки серого. Страницы, растрированные сразу в grayscale, не конвертируются"""
+    array = np.asarray(image)
+    if array.ndim == 2:
+        return array
+    return cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+
+_default_classifier = RegionClassifier()
+
+class PageLayout:
+    """Разметка страницы: оттенки серого, бинаризация, компоненты связности и области картинок и таблиц.
+       Считается один раз на страницу и используется всеми этапами распознавания.
+       Пороги в пикселях заданы для 200 dpi, для других разрешений они умножаются на scale.
+       Крупные компоненты, которые classifier признал блоками текста, не попадают в boxes и распознаются
+       вместе с остальным текстом, их рамки лежат в text_boxes.
+       Если переданы boxes - пара (boxes, text_boxes), уже посчитанная для этой страницы в другом процессе,
+       компоненты связности не считаются, а поиск и классификация областей не повторяются: stats тогда None"""
+
+    def __init__(self, image, threshold: int = 180, min_width: int = 100, min_height: int = 50, scale: float = 1.0,
+                 classifier: RegionClassifier = None, boxes: tuple = None):
+        self.image = image
+        self.scale = scale
+        self.gray = to_gray(image)
+        _, self.binary = cv2.threshold(self.gray, threshold, 255, cv2.THRESH_BINARY_INV)
+        self._otsu = {}
+        if boxes is not None:
+            self.stats = None
+            self.boxes, self.text_boxes = boxes
+            return
+
+        _, _, self.stats, _ = cv2.connectedComponentsWithStats(self.binary, connectivity=8)
+        candidates = self._find_boxes(min_width * scale, min_height * scale)
+        text = (classifier or _default_classifier).text_blocks(self.gray, self.binary, self.stats, candidates, scale)
+        self.boxes = candidates[~text, :4]
+        self.text_boxes = candidates[text, :4]
+
+    def _find_boxes(self, min_width: float, min_height: float) -> np.ndarray:
+        """Строки stats (x, y, w, h, area) крупных компонент. Компоненты, лежащие внутри рамки другой компоненты,
+           отбрасываются, как при внешних контурах"""
+        stats = self.stats[1:]
+        boxes = stats[(stats[:, cv2.CC_STAT_WIDTH] > min_width) & (stats[:, cv2.CC_STAT_HEIGHT] > min_height)]
+        if len(boxes) < 2:
+            return boxes
+
+        x0, y0 = boxes[:, 0], boxes[:, 1]
+        x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+        # contains[i, j]: рамка j лежит внутри рамки i
+        contains = ((x0[:, None] <= x0[None, :]) & (y0[:, None] <= y0[None, :]) &
+                    (x1[:, None] >= x1[None, :]) & (y1[:, None] >= y1[None, :]))
+        np.fill_diagonal(contains, False)
+        # из совпадающих рамок остается первая
+        order = np.arange(len(boxes))
+        contains &= ~(contains.T & (order[:, None] > order[None, :]))
+
+        return boxes[~contains.any(axis=0)]
+
+    def regions(self, start_idx: int = 0) -> list[tuple[int, int, int, int, int]]:
+        """Области картинок и таблиц в виде (x, y, w, h, номер маркера), нумерация с start_idx + 1"""
+        return [(int(x), int(y), int(w), int(h), start_idx + i + 1) for i, (x, y, w, h) in enumerate(self.boxes)]
+
+    def gray_crop(self, box) -> np.ndarray:
+        """Фрагмент страницы в оттенках серого без копирования"""
+        x, y, w, h = box[:4]
+        return self.gray[y:y + h, x:x + w]
+
+    def otsu(self, box) -> np.ndarray:
+        """Бинаризация фрагмента по Оцу, считается один раз на область"""
+        key = tuple(int(v) for v in box[:4])
+        if key not in self._otsu:
+            _, self._otsu[key] = cv2.threshold(self.gray_crop(key), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return self._otsu[key]
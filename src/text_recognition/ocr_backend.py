@@ -0,0 +1,146 @@
+import os
+import threading
+
+import numpy as np
+import pytesseract
+
+# ошибки распознавания обоих движков: pytesseract поднимает TesseractError и TesseractNotFoundError, tesserocr - RuntimeError
+OCR_ERRORS = (pytesseract.TesseractError, pytesseract.TesseractNotFoundError, RuntimeError)
+
+class OCRBackend:
+    """Движок OCR. image_to_data возвращает словарь в формате pytesseract.Output.DICT"""
+    name = "base"
+
+    def image_to_string(self, image, lang: str) -> str:
+        raise NotImplementedError()
+
+    def image_to_data(self, image, lang: str) -> dict:
+        raise NotImplementedError()
+
+class PytesseractBackend(OCRBackend):
+    """Запуск процесса tesseract на каждый вызов через pytesseract"""
+    name = "pytesseract"
+
+    def image_to_string(self, image, lang: str) -> str:
+        return pytesseract.image_to_string(image, lang=lang)
+
+    def image_to_data(self, image, lang: str) -> dict:
+        return pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+
+class TesserocrBackend(OCRBackend):
+    """Tesseract внутри процесса через tesserocr. На каждый поток и набор языков держится один прогретый
+       PyTessBaseAPI, поэтому языковые модели загружаются один раз, а изображения передаются буфером numpy
+       без временных файлов"""
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+
+    def _api(self, lang: str):
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        if lang not in apis:
+            apis[lang] = self._tesserocr.PyTessBaseAPI(lang=lang)
+        return apis[lang]
+
+    def _set_image(self, lang: str, image):
+        array = np.ascontiguousarray(np.asarray(image, dtype=np.uint8))
+        height, width = array.shape[:2]
+        bytes_per_pixel = 1 if array.ndim == 2 else array.shape[2]
+
+        api = self._api(lang)
+        api.SetImageBytes(array.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+        return api
+
+    def image_to_string(self, image, lang: str) -> str:
+        return self._set_image(lang, image).GetUTF8Text()
+
+    def image_to_data(self, image, lang: str) -> dict:
+        RIL = self._tesserocr.RIL
+        api = self._set_image(lang, image)
+        api.Recognize()
+
+        data = {key: [] for key in ("level", "block_num", "par_num", "line_num", "word_num",
+                                    "left", "top", "width", "height", "conf", "text")}
+        block_num = par_num = line_num = word_num = 0
+
+        for word in self._tesserocr.iterate_level(api.GetIterator(), RIL.WORD):
+            if word.IsAtBeginningOf(RIL.BLOCK):
+                block_num += 1
+                par_num = 0
+            if word.IsAtBeginningOf(RIL.PARA):
+                par_num += 1
+                line_num = 0
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line_num += 1
+                word_num = 0
+            word_num += 1
+
+            box = word.BoundingBox(RIL.WORD)
+            if box is None:
+                continue
+            x0, y0, x1, y1 = box
+
+            data["level"].append(5)
+            data["block_num"].append(block_num)
+            data["par_num"].append(par_num)
+            data["line_num"].append(line_num)
+            data["word_num"].append(word_num)
+            data["left"].append(x0)
+            data["top"].append(y0)
+            data["width"].append(x1 - x0)
+            data["height"].append(y1 - y0)
+            data["conf"].append(word.Confidence(RIL.WORD))
+            data["text"].append(word.GetUTF8Text(RIL.WORD) or "")
+
+        return data
+
+def ocr_strips(crops: list, lang: str, gap: int = 20) -> list[str]:
+    """Распознает несколько фрагментов одним вызовом OCR: фрагменты складываются столбиком на белый холст
+       с промежутками gap, слова раскладываются обратно по фрагментам по вертикали. Текст фрагмента - его строки
+       Tesseract через перевод строки"""
+    texts = [""] * len(crops)
+    if not crops:
+        return texts
+
+    heights = np.array([crop.shape[0] for crop in crops])
+    tops = gap + np.concatenate(([0], np.cumsum(heights + gap)[:-1]))
+    canvas = np.full((int(tops[-1] + heights[-1] + gap), max(crop.shape[1] for crop in crops) + 2 * gap), 255, np.uint8)
+    for top, crop in zip(tops, crops):
+        canvas[top:top + crop.shape[0], gap:gap + crop.shape[1]] = crop
+
+    data = get_backend().image_to_data(canvas, lang)
+    lines = {}
+    for i, word in enumerate(data["text"]):
+        if int(data["level"][i]) != 5 or not word.strip():
+            continue
+        center = int(data["top"][i]) + int(data["height"][i]) / 2
+        strip = int(np.searchsorted(tops, center, side="right")) - 1
+        if strip >= 0 and center <= tops[strip] + heights[strip]:
+            line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(strip, {}).setdefault(line, []).append(word)
+
+    for strip, strip_lines in lines.items():
+        texts[strip] = "\n".join(" ".join(words) for words in strip_lines.values())
+    return texts
+
+_backend = None
+
+def get_backend() -> OCRBackend:
+    """Движок OCR процесса. Выбирается переменной OCR_BACKEND (tesserocr или pytesseract),
+       по умолчанию tesserocr, если он установлен"""
+    global _backend
+    if _backend is None:
+        name = os.getenv("OCR_BACKEND", "tesserocr")
+        if name == "tesserocr":
+            try:
+                _backend = TesserocrBackend()
+            except ImportError:
+                _backend = PytesseractBackend()
+        else:
+            _backend = PytesseractBackend()
+    return _backend
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+
+class OCRCache:
+    """Дисковый кэш результатов распознавания страниц с адресацией по содержимому.
+       Ключ - хэш растрированной страницы и параметров распознавания, значение - текст страницы
+       (вместе с разметкой таблиц) и рамки областей. Записи вытесняются по LRU при превышении max_bytes.
+       Запись атомарная (временный файл + os.replace), поэтому кэш можно делить между процессами бота.
+       Размер кэша считается обходом папки при первой записи, а не при создании"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = None
+
+    def key(self, image, **params) -> str:
+        """Ключ страницы: хэш пикселей, размера и режима изображения и параметров распознавания"""
+        array = np.ascontiguousarray(np.asarray(image))
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"shape": array.shape, "dtype": str(array.dtype), **params}, sort_keys=True).encode())
+        digest.update(memoryview(array).cast("B"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, value: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            try:
+                # запись того же ключа другим процессом заменяется, ее размер уже учтен
+                size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(entry_size for _, _, entry_size in self._entries())
+                os.replace(tmp_path, path)
+                self._size += size
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Удаляет давно не использованные записи, пока кэш не уменьшится до 90% от max_bytes.
+           Размер пересчитывается по диску, так как в кэш пишут и другие процессы"""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+
+        for _, path, size in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[OCRCache]:
+    """Кэш распознавания процесса в папке OCR_CACHE_DIR или None, если переменная не задана.
+       Предельный размер задается OCR_CACHE_MAX_MB (по умолчанию 512)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None and os.getenv("OCR_CACHE_DIR"):
+            _cache = OCRCache(os.getenv("OCR_CACHE_DIR"), int(os.getenv("OCR_CACHE_MAX_MB", "512")) * 1024 * 1024)
+    return _cache
@@ -0,0 +1,67 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+from .layout import PageLayout
+
+HEADER = "header"
+FOOTER = "footer"
+
+def _band_rows(ink_rows: np.ndarray, limit: int, min_gap: int) -> Optional[tuple[int, int]]:
+    """Первая полоса строк с чернилами от края страницы, отделенная от остального текста пустым промежутком
+       не меньше min_gap строк и целиком лежащая в первых limit строках"""
+    ink = np.flatnonzero(ink_rows[:limit + min_gap])
+    if len(ink) == 0 or ink[0] >= limit:
+        return None
+
+    gaps = np.flatnonzero(np.diff(ink) > min_gap)
+    end = ink[gaps[0]] + 1 if len(gaps) else ink[-1] + 1
+    if end > limit or (not len(gaps) and ink[-1] + 1 >= limit):
+        return None
+
+    return int(ink[0]), int(end)
+
+def find_bands(layout: PageLayout, max_ratio: float = 0.1, min_gap: int = 20) -> dict[str, tuple[int, int]]:
+    """Полосы колонтитулов страницы в виде {HEADER/FOOTER: (y0, y1)}. Полоса ищется в верхних и нижних
+       max_ratio страницы и не должна задевать области картинок и таблиц"""
+    height = layout.binary.shape[0]
+    limit = int(height * max_ratio)
+    gap = max(1, round(min_gap * layout.scale))
+    ink_rows = layout.binary.any(axis=1)
+
+    bands = {}
+    top = _band_rows(ink_rows, limit, gap)
+    if top is not None:
+        bands[HEADER] = top
+    bottom = _band_rows(ink_rows[::-1], limit, gap)
+    if bottom is not None:
+        bands[FOOTER] = (height - bottom[1], height - bottom[0])
+
+    boxes = layout.boxes
+    for name, (y0, y1) in list(bands.items()):
+        if len(boxes) and ((boxes[:, 1] < y1) & (boxes[:, 1] + boxes[:, 3] > y0)).any():
+            del bands[name]
+
+    return bands
+
+def band_hash(layout: PageLayout, band: tuple[int, int]) -> str:
+    """Хэш пикселей бинаризованной полосы: одинаковые колонтитулы распознаются один раз"""
+    y0, y1 = band
+    return hashlib.sha1(np.ascontiguousarray(layout.binary[y0:y1]).tobytes()).hexdigest()
+
+def normalize_band_text(text: str) -> str:
+    """Текст колонтитула без номеров страниц, регистра и лишних пробелов"""
+    return " ".join(re.sub(r"\d+", "#", text).lower().split())
+
+def repeated_band_texts(pages_bands: list[dict[str, str]], min_repeats: int = 3) -> set[str]:
+    """Нормализованные тексты колонтитулов, которые повторяются не меньше чем на min_repeats страницах"""
+    counts = Counter(
+        normalize_band_text(text)
+        for bands in pages_bands
+        for text in set(bands.values())
+        if normalize_band_text(text)
+    )
+    return {text for text, count in counts.items() if count >= min_repeats}
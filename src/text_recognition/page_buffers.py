@@ -0,0 +1,61 @@
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+class SharedPageBuffers:
+    """Слоты разделяемой памяти для страниц, которые распознаются в пуле процессов. Страница копируется в слот
+       один раз, в процесс пула передается только короткая ссылка (номер и имя слота, форма страницы), а воркер получает
+       numpy-представление той же памяти без копирования и pickle. Слот занят, пока страница в обработке.
+       Подходят и серые (h, w), и цветные (h, w, 3) страницы"""
+
+    def __init__(self, slots: int):
+        self._free = deque(range(slots))
+        self._memory = [None] * slots
+
+    def put(self, image) -> tuple[int, tuple]:
+        """Копирует страницу в свободный слот. Возвращает номер слота и ссылку для page_view"""
+        array = np.asarray(image, dtype=np.uint8)
+        slot = self._free.popleft()
+        memory = self._memory[slot]
+        if memory is None or memory.size < array.nbytes:
+            if memory is not None:
+                memory.close()
+                memory.unlink()
+            memory = self._memory[slot] = shared_memory.SharedMemory(create=True, size=array.nbytes)
+
+        np.ndarray(array.shape, dtype=np.uint8, buffer=memory.buf)[...] = array
+        return slot, (slot, memory.name, array.shape)
+
+    def release(self, slot: int):
+        """Освобождает слот после того, как воркер закончил со страницей"""
+        self._free.append(slot)
+
+    def close(self):
+        for memory in self._memory:
+            if memory is not None:
+                memory.close()
+                memory.unlink()
+        self._memory = [None] * len(self._memory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_attached = {}
+
+def page_view(handle: tuple) -> np.ndarray:
+    """Страница по ссылке из SharedPageBuffers.put в процессе пула: представление разделяемой памяти без копирования.
+       Подключения к слотам переиспользуются между страницами. Если слот пересоздан под страницу большего размера,
+       подключение к старой памяти закрывается: слот пересоздается только после release, то есть когда страница,
+       читавшая старую память, уже обработана"""
+    slot, name, shape = handle
+    memory = _attached.get(slot)
+    if memory is None or memory.name != name:
+        if memory is not None:
+            memory.close()
+        # процессы пула используют трекер ресурсов основного процесса, слот удаляется только в close
+        memory = _attached[slot] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
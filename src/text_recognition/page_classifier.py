@@ -0,0 +1,107 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .layout import PageLayout
+
+PAGE_TEXT = "text"
+PAGE_BLANK = "blank"
+PAGE_FIGURE = "figure"
+PAGE_DUPLICATE = "duplicate"
+
+HASH_SIZE = 16
+THUMBNAIL_WIDTH = 256
+
+def perceptual_hash(gray: np.ndarray) -> np.ndarray:
+    """Разностный хэш (dHash) страницы на HASH_SIZE * HASH_SIZE бит, упакованный в uint8"""
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+def _thumbnail(gray: np.ndarray) -> np.ndarray:
+    """Бинаризованная уменьшенная копия страницы, упакованная по битам"""
+    height = max(1, round(gray.shape[0] * THUMBNAIL_WIDTH / gray.shape[1]))
+    small = cv2.resize(gray, (THUMBNAIL_WIDTH, height), interpolation=cv2.INTER_AREA)
+    return np.packbits(small < 180, axis=1)
+
+class PageClassifier:
+    """Дешевая классификация страниц до OCR по разметке страницы: пустые страницы, страницы из одной
+       картинки и повторы уже встречавшихся страниц (обложки, шаблонные страницы) не отправляются в Tesseract.
+       Классификатор хранит хэши просмотренных страниц, поэтому на документ нужен отдельный экземпляр"""
+
+    def __init__(self, blank_density: float = 0.002, max_blank_components: int = 2, figure_coverage: float = 0.95,
+                 max_outside_components: int = 5, max_hash_distance: int = 8, max_thumbnail_diff: int = 4):
+        self.blank_density = blank_density
+        self.max_blank_components = max_blank_components
+        self.figure_coverage = figure_coverage
+        self.max_outside_components = max_outside_components
+        self.max_hash_distance = max_hash_distance
+        self.max_thumbnail_diff = max_thumbnail_diff
+        self._hashes = []
+        self._thumbnails = []
+        self._page_indices = []
+        self._pages_seen = 0
+
+    def classify(self, layout: PageLayout) -> tuple[str, Optional[int]]:
+        """Тип очередной страницы документа и, для повторов, индекс (с нуля) страницы-оригинала"""
+        page_idx = self._pages_seen
+        self._pages_seen += 1
+
+        stats = layout.stats[1:]
+        areas = stats[:, cv2.CC_STAT_AREA]
+        noise = areas < 10 * layout.scale ** 2
+        ink = int(areas.sum())
+        if ink < self.blank_density * layout.binary.size and int((~noise).sum()) <= self.max_blank_components:
+            return PAGE_BLANK, None
+
+        page_hash = perceptual_hash(layout.gray)
+        thumbnail = _thumbnail(layout.gray)
+        original = self._find_duplicate(page_hash, thumbnail)
+        if original is not None:
+            return PAGE_DUPLICATE, original
+
+        self._hashes.append(page_hash)
+        self._thumbnails.append(thumbnail)
+        self._page_indices.append(page_idx)
+
+        if self._is_figure_only(layout, stats, areas, noise, ink):
+            return PAGE_FIGURE, None
+
+        return PAGE_TEXT, None
+
+    def _is_figure_only(self, layout: PageLayout, stats: np.ndarray, areas: np.ndarray, noise: np.ndarray, ink: int) -> bool:
+        """Почти все чернила страницы лежат в областях картинок, а снаружи только шум, без подписей и текста"""
+        boxes = layout.boxes
+        if len(boxes) == 0:
+            return False
+
+        x0, y0 = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        x1, y1 = x0 + stats[:, cv2.CC_STAT_WIDTH], y0 + stats[:, cv2.CC_STAT_HEIGHT]
+        inside = ((x0[:, None] >= boxes[None, :, 0]) & (y0[:, None] >= boxes[None, :, 1]) &
+                  (x1[:, None] <= boxes[None, :, 0] + boxes[None, :, 2]) &
+                  (y1[:, None] <= boxes[None, :, 1] + boxes[None, :, 3])).any(axis=1)
+
+        outside = ~inside & ~noise
+        outside_ink = int(areas[~inside].sum())
+
+        return (outside_ink <= (1 - self.figure_coverage) * ink and
+                int(outside.sum()) <= self.max_outside_components)
+
+    def _find_duplicate(self, page_hash: np.ndarray, thumbnail: np.ndarray) -> Optional[int]:
+        """Ищет среди просмотренных страниц близкую по хэшу и подтверждает совпадение по уменьшенной копии:
+           отличаться может не больше max_thumbnail_diff пикселей, иначе страницы с тем же макетом, но другим
+           текстом, считались бы повторами"""
+        if not self._hashes:
+            return None
+
+        distances = np.unpackbits(np.stack(self._hashes) ^ page_hash, axis=1).sum(axis=1)
+        candidates = np.flatnonzero(distances <= self.max_hash_distance)
+        if len(candidates) == 0:
+            return None
+
+        for candidate in candidates[np.argsort(distances[candidates])]:
+            other = self._thumbnails[candidate]
+            if other.shape == thumbnail.shape and np.unpackbits(other ^ thumbnail).sum() <= self.max_thumbnail_diff:
+                return self._page_indices[candidate]
+
+        return None
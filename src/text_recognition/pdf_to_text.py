@@ -1,61 +1,71 @@
-import pytesseract
 import pdf2image
 import cv2
 import numpy as np
-from PIL import Image
 from dotenv import load_dotenv
+import multiprocessing
 import os
+import re
+from typing import Optional
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .document import Document, MARKER_PATTERN
+from .embedded_images import EmbeddedImageIndex, has_pdfimages_support
+from .layout import PageLayout, to_gray
+from .ocr_backend import OCR_ERRORS, get_backend, ocr_strips
+from .ocr_cache import OCRCache
+from .page_bands import band_hash, find_bands, normalize_band_text, repeated_band_texts, HEADER, FOOTER
+from .page_buffers import SharedPageBuffers, page_view
+from .page_classifier import PageClassifier, PAGE_BLANK, PAGE_DUPLICATE, PAGE_FIGURE
+from .regions import page_regions
+from .script_detection import ScriptDetector
+from .tables import TableRegion, build_table, recognize_table, table_grid, table_lines, table_to_text, words_to_cells
+from .text_layer import TextLayerReader, has_text_layer_support
 
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
 
-def check_if_table(table_image: Image.Image) -> bool:
-    """Проверяет, является ли изображение таблицей. Используем упрощенную эвристику для ускорения."""
-    
-    import cv2
-    import numpy as np
-    
-    opencv_image = cv2.cvtColor(np.array(table_image), cv2.COLOR_RGB2GRAY)
-    
-    _, thresh = cv2.threshold(opencv_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    
-    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (40, 1))
-    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 40))
-    
-    horizontal_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, horizontal_kernel)
-    vertical_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, vertical_kernel)
+OCR_LANG = "rus+eng"
+# меняется при любом изменении распознавания, чтобы не читать из кэша результаты старой версии
+PIPELINE_VERSION = 3
+
+def iter_pdf_pages(pdf_path: str, window: int = 4, grayscale: bool = False, dpi: int = 200):
+    """Генератор страниц pdf-файла. Страницы растрируются окнами по window штук,
+       поэтому в памяти одновременно находится не больше одного окна, независимо от размера документа"""
+    pages_count = pdf2image.pdfinfo_from_path(pdf_path)["Pages"]
+
+    for first_page in range(1, pages_count + 1, window):
+        last_page = min(first_page + window - 1, pages_count)
+        images = pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=first_page,
+                                             last_page=last_page, grayscale=grayscale)
+        while images:
+            yield images.pop(0)
+
+def check_if_table(layout: PageLayout, box) -> bool:
+    """Проверяет, является ли область страницы таблицей. Используем упрощенную эвристику для ускорения."""
+    horizontal_lines, vertical_lines = table_lines(layout, box)
     
     horizontal_count = cv2.countNonZero(horizontal_lines)
     vertical_count = cv2.countNonZero(vertical_lines)
     
-    return horizontal_count > 50 and vertical_count > 50 
-    
-def image_to_text_without_pictures_and_tables(image, start_idx: int = 0) -> tuple[str, list, int]:
-    """Текст из pdf-файла по переданному пути файла. Картинки и таблицы игнорируются"""
-    ans = "" 
-    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
-    _, thresh = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY_INV)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    mask = np.ones(gray.shape[:2], dtype="uint8") * 255
-
-    masked_regions = []
-    region_idx = start_idx
-    
-    for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-        if w > 100 and h > 50:
-            cv2.rectangle(mask, (x, y), (x+w, y+h), 0, -1)
-            region_idx += 1
-            masked_regions.append((x, y, w, h, region_idx))
-
-    text = cv2.bitwise_and(gray, gray, mask=mask)
+    # у сплошной заливки линиями оказывается вся область, у таблицы - только тонкая сетка
+    area = horizontal_lines.size
+    return (50 * layout.scale < horizontal_count < area / 2 and
+            50 * layout.scale < vertical_count < area / 2)
+
+def _mask_regions(gray: np.ndarray, regions: list, scale: float = 1.0, bands: list = ()) -> np.ndarray:
+    """Копия страницы, на которой области картинок и таблиц закрашены и подписаны маркерами IMAGE_i,
+       а полосы колонтитулов bands [(y0, y1)] стерты"""
+    text = gray.copy()
+    for y0, y1 in bands:
+        text[y0:y1] = 255
     
     font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = 1.2
-    thickness = 3
+    font_scale = 1.2 * scale
+    thickness = max(1, round(3 * scale))
     
-    for x, y, w, h, idx in masked_regions:
+    for x, y, w, h, idx in regions:
         cv2.rectangle(text, (x, y), (x+w, y+h), 255, -1)
         
         marker_text = f"[IMAGE_{idx}]"
@@ -65,74 +75,482 @@ def image_to_text_without_pictures_and_tables(image, start_idx: int = 0) -> tupl
         
         cv2.putText(text, marker_text, (text_x, text_y), 
                     font, font_scale, 0, thickness)
+
+    return text
     
-    ans += f"\n{pytesseract.image_to_string(text, lang='rus+eng')}\n"
+def image_to_text_without_pictures_and_tables(layout: PageLayout, start_idx: int = 0, bands: list = (),
+                                               lang: str = OCR_LANG) -> tuple[str, int]:
+    """Текст страницы по ее разметке. Картинки и таблицы закрашиваются и заменяются маркерами,
+       полосы колонтитулов bands [(y0, y1)] не распознаются"""
+    masked_regions = layout.regions(start_idx)
+    text = _mask_regions(layout.gray, masked_regions, layout.scale, bands)
 
-    return ans, region_idx
+    return f"\n{get_backend().image_to_string(text, lang)}\n", start_idx + len(masked_regions)
 
-def image_to_text_from_tables(image, start_idx: int = 0) -> tuple[dict, int]:
-    """Извлекает таблицы и картинки из pdf-файла"""
-    ans = {}
-    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
-    _, thresh = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY_INV)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    region_idx = start_idx
-    
-    for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-        if w > 100 and h > 50:
-            region_idx += 1
-            table_region = image.crop((x, y, x + w, y + h))
-            key = f"[IMAGE_{region_idx}]"
-            ans[key] = table_region
-    
-    return ans, region_idx
+def _insert_markup(text: str, markup: dict[str, str]) -> str:
+    """Ставит разметку таблиц перед их маркерами за один проход по тексту"""
+    def replace(match: re.Match) -> str:
+        key = match.group(0)
+        return f"{markup[key]}\n{key}" if key in markup else key
 
-def add_table_schema(table_image: Image.Image) -> str:
-    """Добавляет разметку для таблицы по переданному изображению таблицы"""
-    if not check_if_table(table_image):
-        return ""
-    
-    
-    import cv2
-    import numpy as np
-    from PIL import Image
-    
-    opencv_image = cv2.cvtColor(np.array(table_image), cv2.COLOR_RGB2GRAY)
-    
-    _, thresh = cv2.threshold(opencv_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return MARKER_PATTERN.sub(replace, text)
+
+def add_table_schema(layout: PageLayout, box, lang: str = OCR_LANG) -> tuple[str, Optional[dict]]:
+    """Добавляет разметку для таблицы по области страницы. Если находится сетка, таблица распознается
+       по ячейкам и возвращается вместе с разметкой в формате TableSchema"""
+    if not check_if_table(layout, box):
+        return "", None
     
     try:
-        import pytesseract
-        table_text = pytesseract.image_to_string(thresh, lang='rus+eng')
+        table = recognize_table(layout, box, lang)
+        if table is not None:
+            return table_to_text(table), table
+
+        table_text = get_backend().image_to_string(layout.otsu(box), lang)
         
         if table_text.strip():
-            return f"Таблица:\n{table_text}"
+            return f"Таблица:\n{table_text}", None
         else:
-            return "[ТАБЛИЦА]"
-    except:
-        return "[ТАБЛИЦА]"
-
-def pdf_to_text(pdf_path: str) -> tuple[str, dict]:
-    """Возвращает распознанный текст с маркерами изображений (IMAGE_i) и словарь изображений с ключами в виде маркеров.
-       Таблицы заменяются на их разметку и маркеры, картинки остаются как маркеры"""
-    images = pdf2image.convert_from_path(pdf_path)
-    ans = ""
+            return "[ТАБЛИЦА]", None
+    except OCR_ERRORS:
+        return "[ТАБЛИЦА]", None
+
+def _ocr_blocks(image, lang: str = OCR_LANG) -> list[dict]:
+    """Распознает изображение через image_to_data и группирует слова в абзацы Tesseract.
+       Для каждого абзаца возвращаются текст, рамка (x0, y0, x1, y1) и средняя уверенность"""
+    data = get_backend().image_to_data(image, lang)
+
+    blocks = {}
+    for i, word in enumerate(data["text"]):
+        if int(data["level"][i]) != 5 or not word.strip():
+            continue
+        block = blocks.setdefault((data["block_num"][i], data["par_num"][i]), {"lines": {}, "confs": [], "boxes": []})
+        block["lines"].setdefault(data["line_num"][i], []).append(word)
+        block["confs"].append(float(data["conf"][i]))
+        x, y = int(data["left"][i]), int(data["top"][i])
+        block["boxes"].append((x, y, x + int(data["width"][i]), y + int(data["height"][i])))
+
+    result = []
+    for block in blocks.values():
+        boxes = np.array(block["boxes"])
+        result.append({
+            "text": "\n".join(" ".join(words) for words in block["lines"].values()),
+            "bbox": (*boxes[:, :2].min(axis=0), *boxes[:, 2:].max(axis=0)),
+            "conf": float(np.mean(block["confs"])),
+        })
+
+    return result
+
+def _escalated_text(low_image: np.ndarray, render_high, min_confidence: float, lang: str = OCR_LANG) -> str:
+    """Распознает изображение низкого разрешения, а абзацы с уверенностью ниже min_confidence
+       распознает заново по фрагментам изображения высокого разрешения.
+       render_high возвращает изображение высокого разрешения и коэффициент перевода координат,
+       вызывается не больше одного раза и только если такие абзацы есть"""
+    parts = []
+    high = None
+
+    for block in _ocr_blocks(low_image, lang):
+        text = block["text"]
+        if block["conf"] < min_confidence:
+            if high is None:
+                high = render_high()
+            high_image, ratio = high
+            pad = round(5 * ratio)
+            x0, y0, x1, y1 = (round(v * ratio) for v in block["bbox"])
+            crop = high_image[max(0, y0 - pad):y1 + pad, max(0, x0 - pad):x1 + pad]
+            text = get_backend().image_to_string(crop, lang).strip() or text
+        parts.append(text)
+
+    return "\n\n".join(parts)
+
+def two_resolution_page_to_text(layout: PageLayout, start_idx: int, pdf_path: str, page_number: int,
+                                high_dpi: int = 300, min_confidence: float = 70, bands: list = (),
+                                lang: str = OCR_LANG) -> str:
+    """Текст страницы с разметкой таблиц в два прохода: layout и OCR по странице низкого разрешения,
+       затем повторное OCR неуверенно распознанных абзацев по странице, растрированной в high_dpi.
+       Страница высокого разрешения растрируется только если такие абзацы нашлись"""
+    regions = layout.regions(start_idx)
+    high_page = []
+
+    def render_high() -> tuple[np.ndarray, float]:
+        if not high_page:
+            image = pdf2image.convert_from_path(pdf_path, dpi=high_dpi, first_page=page_number,
+                                                last_page=page_number, grayscale=True)[0]
+            gray = to_gray(image)
+            high_page.extend([gray, gray.shape[1] / layout.gray.shape[1]])
+        return high_page[0], high_page[1]
+
+    def render_masked() -> tuple[np.ndarray, float]:
+        gray, ratio = render_high()
+        scaled = [(round(x * ratio), round(y * ratio), round(w * ratio), round(h * ratio), idx) for x, y, w, h, idx in regions]
+        scaled_bands = [(round(y0 * ratio), round(y1 * ratio)) for y0, y1 in bands]
+        return _mask_regions(gray, scaled, layout.scale * ratio, scaled_bands), ratio
+
+    text = _escalated_text(_mask_regions(layout.gray, regions, layout.scale, bands), render_masked, min_confidence, lang)
+
+    markup = {}
+    for region in regions:
+        x, y, w, h, idx = region
+        key = f"[IMAGE_{idx}]"
+        processed_table = ""
+        if check_if_table(layout, region):
+            def render_table() -> tuple[np.ndarray, float]:
+                gray, ratio = render_high()
+                crop = gray[round(y * ratio):round((y + h) * ratio), round(x * ratio):round((x + w) * ratio)]
+                _, thresh = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                return thresh, ratio
+
+            table_text = _escalated_text(layout.otsu(region), render_table, min_confidence, lang)
+            processed_table = f"Таблица:\n{table_text}" if table_text.strip() else "[ТАБЛИЦА]"
+        markup[key] = processed_table
+
+    return f"\n{_insert_markup(text, markup)}\n"
+
+def text_layer_to_text(layout: PageLayout, layer_page: dict, start_idx: int = 0,
+                       bands: dict = None) -> tuple[str, dict[str, str], list]:
+    """Собирает текст страницы из встроенного текстового слоя без Tesseract.
+       Слова внутри областей картинок и таблиц отбрасываются, на месте области ставится маркер IMAGE_i,
+       для таблиц разметка строится из слов текстового слоя, разложенных по ячейкам сетки, если она находится.
+       Третьим элементом возвращаются распознанные таблицы по областям (None для остальных).
+       Слова из полос колонтитулов bands {имя: (y0, y1)} возвращаются отдельно от текста страницы"""
+    scale = layout.gray.shape[1] / layer_page["width"]
+    regions = layout.regions(start_idx)
+    region_lines = {idx: [] for *_, idx in regions}
+    region_words_xy = {idx: [] for *_, idx in regions}
+    bands = bands or {}
+    band_lines = {name: [] for name in bands}
+
+    blocks = []
+    for block in layer_page["blocks"]:
+        lines = []
+        top = None
+        for line in block["lines"]:
+            line_words = []
+            region_words = {}
+            band_words = {}
+            for x0, y0, x1, y1, word in line["words"]:
+                cx, cy = (x0 + x1) / 2 * scale, (y0 + y1) / 2 * scale
+                band = next((name for name, (band_y0, band_y1) in bands.items() if band_y0 <= cy <= band_y1), None)
+                if band is not None:
+                    band_words.setdefault(band, []).append(word)
+                    continue
+                region_idx = next((idx for x, y, w, h, idx in regions if x <= cx <= x + w and y <= cy <= y + h), None)
+                if region_idx is None:
+                    line_words.append(word)
+                    top = y0 * scale if top is None else min(top, y0 * scale)
+                else:
+                    region_words.setdefault(region_idx, []).append(word)
+                    region_words_xy[region_idx].append((cx, cy, word))
+
+            if line_words:
+                lines.append(" ".join(line_words))
+            for region_idx, words in region_words.items():
+                region_lines[region_idx].append(" ".join(words))
+            for band, words in band_words.items():
+                band_lines[band].append(" ".join(words))
+
+        if lines:
+            blocks.append((top, "\n".join(lines)))
+
+    region_parts = []
+    tables = []
+    for region in regions:
+        x, y, w, h, idx = region
+        key = f"[IMAGE_{idx}]"
+
+        processed_table = ""
+        table = None
+        if check_if_table(layout, region):
+            grid = table_grid(layout, region)
+            if grid is not None:
+                table = build_table(words_to_cells(region_words_xy[idx], *grid), *grid)
+            if table is not None:
+                processed_table = table_to_text(table)
+            else:
+                table_text = "\n".join(region_lines[idx])
+                processed_table = f"Таблица:\n{table_text}" if table_text.strip() else "[ТАБЛИЦА]"
+        tables.append(table)
+        region_parts.append((y, f"{processed_table}\n{key}" if processed_table else key))
+
+    parts = []
+    pending = sorted(region_parts, key=lambda part: part[0])
+    for top, block_text in blocks:
+        while pending and pending[0][0] <= top:
+            parts.append(pending.pop(0)[1])
+        parts.append(block_text)
+    parts.extend(part for _, part in pending)
+
+    text = "\n\n".join(parts)
+    return f"\n{text}\n", {name: "\n".join(lines) for name, lines in band_lines.items()}, tables
+
+def shift_markers(text: str, delta: int) -> str:
+    """Сдвигает номера всех маркеров IMAGE_i в тексте на delta"""
+    if delta == 0:
+        return text
+    return MARKER_PATTERN.sub(lambda match: f"[IMAGE_{int(match.group(1)) + delta}]", text)
+
+def figure_page_to_text(layout: PageLayout, start_idx: int = 0) -> tuple[str, list, dict, list]:
+    """Страница из одних картинок: вместо OCR в текст попадают только их маркеры"""
+    text = "\n".join(f"[IMAGE_{region[4]}]" for region in layout.regions(start_idx))
+    return f"\n{text}\n", layout.boxes.tolist(), {}, [None] * len(layout.boxes)
+
+def _process_page(image, start_idx: int = 0, layer_page: dict = None, dpi: int = 200,
+                  escalation: tuple = None, layout: PageLayout = None,
+                  bands: dict = None, languages: str = OCR_LANG) -> tuple[str, list, dict, list]:
+    """Распознает одну страницу: текст с разметкой таблиц, рамки областей картинок и таблиц,
+       тексты колонтитулов и распознанные по ячейкам таблицы по областям (None для остальных).
+       Нумерация маркеров начинается с start_idx + 1.
+       Если передан пригодный текстовый слой, OCR не выполняется.
+       languages - языки Tesseract для страницы.
+       escalation - аргументы two_resolution_page_to_text (pdf_path, page_number, high_dpi, min_confidence).
+       bands - полосы колонтитулов {имя: (y0, y1)}, они не распознаются вместе со страницей: их тексты
+       возвращаются только для текстового слоя, для сканов их пачкой распознает pdf_to_text.
+       Уже посчитанную разметку можно передать в layout"""
+    if layout is None:
+        layout = PageLayout(image, scale=dpi / 200)
+    boxes = layout.boxes.tolist()
+    bands = bands or {}
+
+    if layer_page is not None:
+        text, band_texts, tables = text_layer_to_text(layout, layer_page, start_idx, bands)
+        return text, boxes, band_texts, tables
+
+    band_rows = list(bands.values())
+    band_texts = {}
+
+    if escalation is not None:
+        text = two_resolution_page_to_text(layout, start_idx, *escalation, bands=band_rows, lang=languages)
+        return text, boxes, band_texts, [None] * len(boxes)
+
+    text_without_tables, _ = image_to_text_without_pictures_and_tables(layout, start_idx, band_rows, languages)
+
+    tables = []
+    markup = {}
+    for region in layout.regions(start_idx):
+        markup[f"[IMAGE_{region[4]}]"], table = add_table_schema(layout, region, languages)
+        tables.append(table)
+
+    return _insert_markup(text_without_tables, markup), boxes, band_texts, tables
+
+def _cached_page(cache: OCRCache, key: str, start_idx: int) -> Optional[tuple[str, list, dict, list]]:
+    """Результат страницы из кэша с маркерами, перенумерованными с start_idx + 1"""
+    cached = cache.get(key)
+    if cached is None:
+        return None
+
+    boxes = cached["boxes"]
+    return shift_markers(cached["text"], start_idx), boxes, cached.get("bands", {}), cached.get("tables", [None] * len(boxes))
+
+def _process_shared_page(handle: tuple, boxes: Optional[tuple], layer_page: dict, dpi: int, escalation: tuple,
+                         bands: dict, languages: str) -> tuple[str, list, dict, list]:
+    """_process_page в процессе пула для страницы из разделяемой памяти, маркеры нумеруются с 1.
+       boxes - рамки (boxes, text_boxes), найденные в основном процессе: классификация областей не повторяется"""
+    image = page_view(handle)
+    layout = PageLayout(image, scale=dpi / 200, boxes=boxes)
+    return _process_page(image, 0, layer_page, dpi, escalation, layout, bands, languages)
+
+def _init_ocr_worker():
+    """Tesseract внутри процесса пула работает в один поток, параллелизм дают сами процессы"""
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+def _join_pages(pages: list[tuple[str, dict]], min_band_repeats: int = 3) -> Document:
+    """Собирает документ из текстов страниц, возвращая на место колонтитулы, которые не повторяются по документу"""
+    repeated = repeated_band_texts([bands for _, bands in pages], min_band_repeats)
+
+    page_texts = []
+    for text, bands in pages:
+        header = bands.get(HEADER, "")
+        footer = bands.get(FOOTER, "")
+        parts = []
+        if header and normalize_band_text(header) not in repeated:
+            parts.append(f"\n{header}\n")
+        parts.append(text)
+        if footer and normalize_band_text(footer) not in repeated:
+            parts.append(f"\n{footer}\n")
+        page_texts.append("".join(parts))
+
+    return Document.from_pages(page_texts)
+
+def pdf_to_text(pdf_path: str, workers: int = 1, window: int = 4, grayscale: bool = False,
+                use_text_layer: bool = True, dpi: int = 200, cache: OCRCache = None,
+                escalate_dpi: int = None, min_confidence: float = 70,
+                classify_pages: bool = True, suppress_bands: bool = True,
+                min_band_repeats: int = 3, extract_embedded: bool = True, languages: str = OCR_LANG,
+                detect_script: bool = True) -> tuple[Document, dict]:
+    """Возвращает распознанный документ (Document: текст с маркерами изображений IMAGE_i и интервалы страниц,
+       блоков и якорей маркеров) и словарь изображений с ключами в виде маркеров.
+       Таблицы заменяются на их разметку и маркеры, картинки остаются как маркеры.
+       Страницы растрируются потоково окнами по window штук и сразу уходят на распознавание.
+       При workers > 1 страницы распознаются в пуле процессов, результат совпадает с последовательным.
+       Страницы со встроенным текстовым слоем (pdf из Word, LaTeX) собираются из него без OCR.
+       Если передан cache, уже распознанные страницы берутся из него без OCR.
+       Если задан escalate_dpi, страницы растрируются в dpi (например 100) и распознаются через image_to_data,
+       а абзацы с уверенностью ниже min_confidence распознаются повторно по странице в escalate_dpi.
+       При classify_pages пустые страницы пропускаются, для страниц из одних картинок выдаются только маркеры,
+       а повторы уже встречавшихся страниц получают их текст без повторного OCR.
+       При suppress_bands колонтитулы распознаются отдельно от страниц: одинаковые по пикселям - один раз,
+       остальные (например, с номерами страниц) - пачкой одним вызовом OCR на окно страниц.
+       Повторяющиеся хотя бы на min_band_repeats страницах колонтитулы в текст не попадают.
+       Значения словаря изображений - ссылки ImageRegion, пиксели растрируются только при обращении.
+       При extract_embedded области, совпавшие со встроенными в pdf изображениями, отдаются ссылками
+       EmbeddedImage на исходные байты, вырезание из растра остается для векторных рисунков и сканов.
+       Таблицы, распознанные по ячейкам, отдаются ссылками TableRegion с готовой TableSchema.
+       languages - набор языков Tesseract (например rus+eng+deu), при detect_script для страниц по образцу
+       текста остаются только языки встретившихся письменностей. Образец распознается в основном процессе,
+       выбор страницы с одной письменностью переиспользуется следующими страницами, поэтому лишний вызов
+       OCR приходится на одну страницу из ScriptDetector.redetect_every, а для смешанных документов - на каждую"""
+    pages = iter_pdf_pages(pdf_path, window=window, grayscale=grayscale, dpi=dpi)
+    text_layer = None
+    if use_text_layer and has_text_layer_support():
+        text_layer = TextLayerReader(pdf_path, window=window)
+    classifier = PageClassifier() if classify_pages else None
+    detector = ScriptDetector(languages) if detect_script else None
+    embedded = None
+    if extract_embedded and has_pdfimages_support():
+        embedded = EmbeddedImageIndex(pdf_path)
+    page_results = []
     images_dict = {}
+    known_band_texts = {}
+    pending_bands = {}
     global_image_idx = 0
 
-    for i, image in enumerate(images):
-        text_without_tables, next_idx = image_to_text_without_pictures_and_tables(image, global_image_idx)
-        tables_dict, next_idx2 = image_to_text_from_tables(image, global_image_idx)
-        
-        global_image_idx = max(next_idx, next_idx2)
+    def page_tasks():
+        """Для каждой страницы отдает готовый результат (кортеж или индекс страницы-оригинала для повторов),
+           либо None и аргументы _process_page. Маркеры в результатах нумеруются с 1, сквозные номера
+           им дает collect. Ключ кэша отдается только для страниц, которые нужно распознать,
+           хэши колонтитулов - для страниц, где они будут распознаны.
+           Разметка в основном процессе считается, только если она нужна классификатору страниц или колонтитулам"""
+        for page_number, image in enumerate(pages, start=1):
+            layout = PageLayout(image, scale=dpi / 200) if classifier is not None or suppress_bands else None
+            kind, original = classifier.classify(layout) if classifier else (None, None)
+            if kind == PAGE_DUPLICATE:
+                yield page_number, original, None, None, {}
+                continue
 
-        for key, table_image in tables_dict.items():
-            images_dict[key] = table_image
-            processed_table = add_table_schema(table_image)
-            text_without_tables = text_without_tables.replace(key, f"{processed_table}\n{key}")
-        
-        ans += text_without_tables
-    
-    return ans, images_dict
+            layer_page = text_layer.page(page_number) if text_layer else None
+            if layer_page is None and kind == PAGE_BLANK:
+                yield page_number, ("\n\n", [], {}, []), None, None, {}
+                continue
+            if layer_page is None and kind == PAGE_FIGURE:
+                yield page_number, figure_page_to_text(layout), None, None, {}
+                continue
+
+            key = None
+            if cache is not None and layer_page is None:
+                key = cache.key(image, dpi=dpi, lang=languages, detect_script=detect_script, version=PIPELINE_VERSION,
+                                backend=get_backend().name, escalate_dpi=escalate_dpi, min_confidence=min_confidence,
+                                bands=suppress_bands)
+                cached = _cached_page(cache, key, 0)
+                if cached is not None:
+                    yield page_number, cached, None, None, {}
+                    continue
+
+            lang = languages
+            if detector is not None and layer_page is None:
+                if layout is None:
+                    layout = PageLayout(image, scale=dpi / 200)
+                lang = detector.detect_next(layout)
+
+            bands = {}
+            band_hashes = {}
+            if suppress_bands:
+                for name, (y0, y1) in find_bands(layout).items():
+                    value = band_hash(layout, (y0, y1))
+                    band_hashes[name] = value
+                    bands[name] = (y0, y1)
+                    # у страниц с текстовым слоем колонтитулы берутся из него
+                    if layer_page is None and value not in known_band_texts and value not in pending_bands:
+                        pending_bands[value] = layout.gray[y0:y1].copy()
+
+            escalation = None
+            if escalate_dpi is not None:
+                escalation = (pdf_path, page_number, escalate_dpi, min_confidence)
+            yield page_number, None, (image, layer_page, escalation, bands, layout, lang), key, band_hashes
+
+    shared_slots = {}
+
+    def recognize_bands():
+        """Распознает все накопленные колонтитулы одним вызовом OCR"""
+        values = list(pending_bands)
+        try:
+            texts = ocr_strips([pending_bands[value] for value in values], languages)
+        except OCR_ERRORS:
+            texts = [""] * len(values)
+        for value, text in zip(values, texts):
+            known_band_texts.setdefault(value, text.strip())
+        pending_bands.clear()
+
+    def collect(page_number: int, result, key: Optional[str], band_hashes: dict):
+        nonlocal global_image_idx
+        if isinstance(result, Future):
+            future, result = result, result.result()
+            buffers.release(shared_slots.pop(future))
+        if isinstance(result, int):
+            page_results.append(page_results[result])
+            return
+
+        text, boxes, band_texts, tables = result
+        if any(value in pending_bands for value in band_hashes.values()):
+            recognize_bands()
+        for name, value in band_hashes.items():
+            band_texts.setdefault(name, known_band_texts.get(value, ""))
+            known_band_texts.setdefault(value, band_texts[name])
+        if key is not None:
+            cache.put(key, {"text": text, "boxes": boxes, "bands": band_texts, "tables": tables})
+        start_idx = global_image_idx
+        global_image_idx += len(boxes)
+        regions = page_regions(pdf_path, page_number, boxes, start_idx, dpi, escalate_dpi)
+        markers = list(regions)
+        if embedded is not None:
+            regions.update(embedded.regions(page_number, boxes, start_idx, dpi))
+        # распознанная таблица важнее совпавшей по размеру встроенной картинки
+        for marker, table in zip(markers, tables):
+            table_region = TableRegion.from_table(table, regions[marker]) if table is not None else None
+            if table_region is not None:
+                regions[marker] = table_region
+        images_dict.update(regions)
+        page_results.append((shift_markers(text, start_idx), band_texts))
+
+    if workers > 1:
+        max_in_flight = workers * 2
+        in_flight = deque()
+
+        # страницы передаются воркерам через разделяемую память, слотов столько же, сколько страниц в обработке.
+        # Процессы пула запускаются через forkserver: fork многопоточного процесса бота (потоки torch,
+        # таймеры реестра моделей, инициализированный OpenMP) может повесить Tesseract внутри воркера
+        with SharedPageBuffers(max_in_flight) as buffers, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                                    mp_context=multiprocessing.get_context("forkserver")) as executor:
+            for page_number, result, args, key, band_hashes in page_tasks():
+                if result is None:
+                    # в процесс пула уходят только рамки областей: бинаризация там дешевле пересылки массивов,
+                    # а классификация областей уже сделана
+                    image, layer_page, escalation, bands, layout, lang = args
+                    boxes = (layout.boxes, layout.text_boxes) if layout is not None else None
+                    slot, handle = buffers.put(image)
+                    result = executor.submit(_process_shared_page, handle, boxes, layer_page, dpi, escalation,
+                                             bands, lang)
+                    shared_slots[result] = slot
+                in_flight.append((page_number, result, key, band_hashes))
+
+                if len(in_flight) >= max_in_flight:
+                    collect(*in_flight.popleft())
+
+            while in_flight:
+                collect(*in_flight.popleft())
+
+        return _join_pages(page_results, min_band_repeats), images_dict
+
+    # результаты собираются с отставанием на окно страниц, чтобы колонтитулы окна распознались одной пачкой
+    done = deque()
+    for page_number, result, args, key, band_hashes in page_tasks():
+        if result is None:
+            image, layer_page, escalation, bands, layout, lang = args
+            result = _process_page(image, 0, layer_page, dpi, escalation, layout, bands, lang)
+        done.append((page_number, result, key, band_hashes))
+        if len(done) >= window:
+            collect(*done.popleft())
+    while done:
+        collect(*done.popleft())
+
+    return _join_pages(page_results, min_band_repeats), images_dict
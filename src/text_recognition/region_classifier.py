@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+
+def _segments(lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Для склеенных подряд отрезков длины lengths: номер отрезка каждого элемента,
+       смещение элемента внутри отрезка и начала отрезков"""
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    seg = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(int(lengths.sum())) - starts[seg]
+    return seg, offsets, starts
+
+def _line_profiles(binary: np.ndarray, y0: np.ndarray, h: np.ndarray, x0: np.ndarray, x1: np.ndarray):
+    """Профили строк всех рамок сразу: число пикселей чернил и число серий чернил в каждой строке рамки.
+       Строки всех рамок склеены в один массив, seg - номер рамки строки"""
+    ink = binary > 0
+    ink_sum = np.zeros((ink.shape[0], ink.shape[1] + 1), dtype=np.int32)
+    np.cumsum(ink, axis=1, out=ink_sum[:, 1:])
+    run_starts = np.zeros_like(ink_sum)
+    np.cumsum(ink & ~np.pad(ink, ((0, 0), (1, 0)))[:, :-1], axis=1, out=run_starts[:, 1:])
+
+    seg, offsets, starts = _segments(h)
+    rows = y0[seg] + offsets
+    left, right = x0[seg], x1[seg]
+    row_ink = ink_sum[rows, right] - ink_sum[rows, left]
+    # серия, начавшаяся левее рамки, тоже считается
+    continued = ink[rows, left] & (left > 0) & ink[rows, np.maximum(left - 1, 0)]
+    row_runs = run_starts[rows, right] - run_starts[rows, left] + continued
+    return seg, starts, row_ink, row_runs
+
+def _groups(flags: np.ndarray, seg: np.ndarray, starts: np.ndarray, count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Начала групп подряд идущих отмеченных строк внутри каждого отрезка и число групп в каждом отрезке"""
+    previous = np.concatenate(([False], flags[:-1]))
+    previous[starts] = False
+    group_starts = np.flatnonzero(flags & ~previous)
+    return group_starts, np.bincount(seg[group_starts], minlength=count)
+
+def region_features(binary: np.ndarray, stats: np.ndarray, candidates: np.ndarray) -> dict:
+    """Признаки всех областей-кандидатов сразу. candidates - строки stats (x, y, w, h, area) самих кандидатов.
+       fill - доля площади рамки под компонентой, density - доля чернил в рамке, components - число компонент
+       внутри рамки, lines/pitch/pitch_cv - число строк текста, их шаг и разброс шага, text_rows - доля строк
+       с текстом, run - средняя длина серии чернил в строках текста, h_rules/v_rules - число сплошных линеек"""
+    n = len(candidates)
+    x0, y0 = candidates[:, 0], candidates[:, 1]
+    w, h = candidates[:, 2], candidates[:, 3]
+    x1, y1 = x0 + w, y0 + h
+    area = (w * h).astype(np.float64)
+
+    comps = stats[1:]
+    cx0, cy0 = comps[:, cv2.CC_STAT_LEFT], comps[:, cv2.CC_STAT_TOP]
+    cx1, cy1 = cx0 + comps[:, cv2.CC_STAT_WIDTH], cy0 + comps[:, cv2.CC_STAT_HEIGHT]
+    inside = ((cx0[:, None] >= x0[None, :]) & (cy0[:, None] >= y0[None, :]) &
+              (cx1[:, None] <= x1[None, :]) & (cy1[:, None] <= y1[None, :]))
+    components = inside.sum(axis=0) - 1
+
+    seg, starts, row_ink, row_runs = _line_profiles(binary, y0, h, x0, x1)
+    col_seg, col_starts, col_ink, _ = _line_profiles(binary.T, x0, w, y0, y1)
+
+    # строка текста - строка с несколькими сериями чернил, промежутки между строками дают 0-2 серии (рамка)
+    text_row = row_runs > 4
+    line_starts, lines = _groups(text_row, seg, starts, n)
+
+    pitch_diff = np.diff(line_starts).astype(np.float64)
+    same_box = seg[line_starts][1:] == seg[line_starts][:-1]
+    pitch_seg = seg[line_starts][1:][same_box]
+    pitch_diff = pitch_diff[same_box]
+    pitch_count = np.bincount(pitch_seg, minlength=n)
+    pitch = np.bincount(pitch_seg, weights=pitch_diff, minlength=n) / np.maximum(pitch_count, 1)
+    pitch_sq = np.bincount(pitch_seg, weights=pitch_diff ** 2, minlength=n) / np.maximum(pitch_count, 1)
+    pitch_std = np.sqrt(np.maximum(pitch_sq - pitch ** 2, 0))
+
+    text_ink = np.bincount(seg, weights=row_ink * text_row, minlength=n)
+    text_runs = np.bincount(seg, weights=row_runs * text_row, minlength=n)
+
+    _, h_rules = _groups(row_ink >= 0.9 * w[seg], seg, starts, n)
+    _, v_rules = _groups(col_ink >= 0.9 * h[col_seg], col_seg, col_starts, n)
+
+    return {
+        "fill": candidates[:, cv2.CC_STAT_AREA] / area,
+        "density": np.bincount(seg, weights=row_ink, minlength=n) / area,
+        "components": components,
+        "lines": lines,
+        "pitch": pitch,
+        "pitch_cv": np.where(pitch > 0, pitch_std / np.maximum(pitch, 1e-9), np.inf),
+        "text_rows": np.bincount(seg, weights=text_row, minlength=n) / h,
+        "run": text_ink / np.maximum(text_runs, 1),
+        "h_rules": h_rules,
+        "v_rules": v_rules,
+    }
+
+class RegionClassifier:
+    """Отличает блоки текста от картинок и таблиц среди крупных компонент страницы. Абзац в рамке, на темной
+       заливке или с подчеркиваниями склеивается в одну компоненту и выглядит как картинка. У текста строки идут
+       с ровным шагом, серии чернил в строках короткие (штрихи букв), а сплошных линеек, как у таблицы, нет.
+       Пороги в пикселях заданы для 200 dpi"""
+
+    def __init__(self, min_lines: int = 3, max_pitch_cv: float = 0.3, min_pitch: float = 15, max_pitch: float = 120,
+                 min_text_rows: float = 0.25, max_text_rows: float = 0.9, solid_fill: float = 0.9):
+        self.min_lines = min_lines
+        self.max_pitch_cv = max_pitch_cv
+        self.min_pitch = min_pitch
+        self.max_pitch = max_pitch
+        self.min_text_rows = min_text_rows
+        self.max_text_rows = max_text_rows
+        self.solid_fill = solid_fill
+
+    def text_blocks(self, gray: np.ndarray, binary: np.ndarray, stats: np.ndarray, candidates: np.ndarray,
+                    scale: float = 1.0) -> np.ndarray:
+        """Маска кандидатов, которые являются блоками текста и должны распознаваться, а не закрашиваться"""
+        if len(candidates) == 0:
+            return np.zeros(0, dtype=bool)
+
+        f = region_features(self._detail(gray, binary, candidates), stats, candidates)
+        periodic = ((f["lines"] >= self.min_lines) & (f["pitch_cv"] <= self.max_pitch_cv) &
+                    (f["pitch"] >= self.min_pitch * scale) & (f["pitch"] <= self.max_pitch * scale) &
+                    (f["text_rows"] >= self.min_text_rows) & (f["text_rows"] <= self.max_text_rows))
+        strokes = f["run"] < 0.5 * f["pitch"]
+        # на заливке буквы видны только после повторной бинаризации, без заливки они - отдельные компоненты
+        letters = (f["fill"] >= self.solid_fill) | (f["components"] >= 3 * f["lines"])
+        table = (f["h_rules"] >= 3) & (f["v_rules"] >= 3)
+        return periodic & strokes & letters & ~table
+
+    def _detail(self, gray: np.ndarray, binary: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Бинаризация, в которой сплошные компоненты (текст на темной заливке, фотографии) заменены
+           бинаризацией по Оцу внутри своей рамки. Иначе текст на заливке целиком уходит в чернила.
+           Чернилами считается меньший из двух цветов рамки: светлый текст на темной заливке тоже становится
+           штрихами, а не дырками в сплошной заливке"""
+        solid = candidates[candidates[:, cv2.CC_STAT_AREA] >= self.solid_fill * candidates[:, 2] * candidates[:, 3]]
+        if len(solid) == 0:
+            return binary
+
+        detail = binary.copy()
+        for x, y, w, h in solid[:, :4]:
+            crop = detail[y:y + h, x:x + w]
+            cv2.threshold(gray[y:y + h, x:x + w], 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU, dst=crop)
+            if cv2.countNonZero(crop) * 2 > crop.size:
+                np.bitwise_not(crop, out=crop)
+        return detail
@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+import pdf2image
+from PIL import Image
+
+@lru_cache(maxsize=2)
+def _render_page(pdf_path: str, page_number: int, dpi: int) -> Image.Image:
+    """Растрирует одну страницу. Кэш на две страницы: картинки слайдов обычно идут подряд с одной страницы"""
+    return pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+
+class ImageRegion:
+    """Ссылка на область картинки или таблицы на странице pdf: номер страницы, рамка в пикселях при dpi
+       и разрешение, в котором область растрируется. Пиксели получаются только при обращении,
+       поэтому память не зависит от числа областей в документе"""
+    extension = ".png"
+    vis_type = "extracted_image"
+
+    def __init__(self, pdf_path: str, page_number: int, box: tuple[int, int, int, int], dpi: int = 200,
+                 render_dpi: int = None):
+        self.pdf_path = pdf_path
+        self.page_number = page_number
+        self.box = tuple(box)
+        self.dpi = dpi
+        self.render_dpi = render_dpi or dpi
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """Размер области в пикселях при render_dpi"""
+        ratio = self.render_dpi / self.dpi
+        return round(self.box[2] * ratio), round(self.box[3] * ratio)
+
+    def materialize(self) -> Image.Image:
+        """Вырезает область из страницы, растрированной в render_dpi"""
+        page = _render_page(self.pdf_path, self.page_number, self.render_dpi)
+        ratio = self.render_dpi / self.dpi
+        x, y, w, h = (round(v * ratio) for v in self.box)
+        return page.crop((x, y, x + w, y + h))
+
+    def save(self, path: str):
+        self.materialize().save(path)
+
+    def __repr__(self) -> str:
+        return f"ImageRegion(page={self.page_number}, box={self.box}, dpi={self.dpi})"
+
+def page_regions(pdf_path: str, page_number: int, boxes: list, start_idx: int = 0, dpi: int = 200,
+                 render_dpi: int = None) -> dict[str, ImageRegion]:
+    """Словарь маркер -> ссылка на область для рамок одной страницы, нумерация маркеров с start_idx + 1"""
+    return {
+        f"[IMAGE_{start_idx + i + 1}]": ImageRegion(pdf_path, page_number, box, dpi, render_dpi)
+        for i, box in enumerate(boxes)
+    }
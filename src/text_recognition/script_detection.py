@@ -0,0 +1,114 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+from .layout import PageLayout
+from .ocr_backend import get_backend
+
+# письменность языковых моделей Tesseract, для новых языков достаточно добавить их сюда
+LANGUAGE_SCRIPTS = {
+    "rus": "cyrillic", "ukr": "cyrillic", "bel": "cyrillic", "bul": "cyrillic", "srp": "cyrillic", "kaz": "cyrillic",
+    "eng": "latin", "deu": "latin", "fra": "latin", "spa": "latin", "ita": "latin", "por": "latin", "pol": "latin",
+    "ell": "greek",
+}
+
+SCRIPT_PATTERNS = {
+    "cyrillic": re.compile("[\u0400-\u04ff]"),
+    "latin": re.compile("[A-Za-z\u00c0-\u024f]"),
+    "greek": re.compile("[\u0370-\u03ff]"),
+}
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def script_histogram(text: str) -> Counter:
+    """Число слов каждой письменности. Слово относится к письменности большинства своих букв,
+       поэтому единичные перепутанные похожие буквы (о/o, с/c) письменность не меняют"""
+    counts = Counter()
+    for word in WORD_PATTERN.findall(text):
+        letters = Counter({script: len(pattern.findall(word)) for script, pattern in SCRIPT_PATTERNS.items()})
+        script, count = letters.most_common(1)[0]
+        if count:
+            counts[script] += 1
+    return counts
+
+def select_languages(histogram: Counter, languages: str, min_share: float = 0.02) -> str:
+    """Языки из набора languages, письменность которых встречается хотя бы в min_share слов.
+       Языки с неизвестной письменностью остаются всегда, пустая гистограмма оставляет весь набор"""
+    total = sum(histogram.values())
+    if not total:
+        return languages
+
+    selected = [lang for lang in languages.split("+")
+                if LANGUAGE_SCRIPTS.get(lang) is None or histogram[LANGUAGE_SCRIPTS[lang]] >= max(1, min_share * total)]
+    return "+".join(selected) or languages
+
+def text_sample(layout: PageLayout, strips: int = 3, strip_height: int = 100) -> np.ndarray:
+    """Образец текста страницы: в каждой из strips горизонтальных частей берется полоса высотой strip_height
+       с наибольшим количеством чернил вне областей картинок и таблиц, полосы склеиваются столбиком"""
+    height = layout.gray.shape[0]
+    strip_height = min(height, max(1, round(strip_height * layout.scale)))
+
+    boxes = layout.boxes
+    profile = np.count_nonzero(layout.binary, axis=1)
+    for x, y, w, h in boxes:
+        profile[y:y + h] -= np.count_nonzero(layout.binary[y:y + h, x:x + w], axis=1)
+    window = np.convolve(profile, np.ones(strip_height, dtype=np.int64), mode="valid")
+
+    parts = []
+    for part in np.array_split(np.arange(len(window)), strips):
+        if not len(part):
+            continue
+        top = int(part[np.argmax(window[part])])
+        if window[top] == 0:
+            continue
+        strip = layout.gray[top:top + strip_height].copy()
+        for x, y, w, h in boxes:
+            strip[max(0, y - top):max(0, y + h - top), x:x + w] = 255
+        parts.append(strip)
+
+    if not parts:
+        return layout.gray[:0]
+    return np.vstack(parts)
+
+class ScriptDetector:
+    """Выбор языковых моделей Tesseract для страницы. Образец текста распознается всем набором языков,
+       по гистограмме письменностей слов остаются только нужные модели: чисто английская или чисто русская
+       страница распознается одной моделью, что быстрее и часто точнее.
+       Для страниц документа подряд detect_next переиспользует выбор прошлой страницы с одной письменностью
+       и распознает образец заново только раз в redetect_every страниц"""
+
+    def __init__(self, languages: str = "rus+eng", min_share: float = 0.02, strips: int = 3, strip_height: int = 100,
+                 redetect_every: int = 10):
+        self.languages = languages
+        self.min_share = min_share
+        self.strips = strips
+        self.strip_height = strip_height
+        self.redetect_every = redetect_every
+        self._last = None
+        self._reused = 0
+
+    def detect(self, layout: PageLayout) -> str:
+        """Языки для распознавания страницы в формате Tesseract (например rus, eng или rus+eng)"""
+        scripts = {LANGUAGE_SCRIPTS[lang] for lang in self.languages.split("+") if lang in LANGUAGE_SCRIPTS}
+        if len(scripts) < 2:
+            return self.languages
+
+        sample = text_sample(layout, self.strips, self.strip_height)
+        if sample.size == 0:
+            return self.languages
+
+        text = get_backend().image_to_string(sample, self.languages)
+        return select_languages(script_histogram(text), self.languages, self.min_share)
+
+    def detect_next(self, layout: PageLayout) -> str:
+        """Языки очередной страницы документа. Выбор страницы со смешанными письменностями не переиспользуется:
+           на следующей странице образец распознается снова"""
+        if self._last is not None and self._reused < self.redetect_every - 1:
+            self._reused += 1
+            return self._last
+
+        lang = self.detect(layout)
+        self._last = lang if lang != self.languages else None
+        self._reused = 0
+        return lang
@@ -0,0 +1,126 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from visgen.schemas import TableSchema
+
+from .layout import PageLayout
+from .ocr_backend import ocr_strips
+
+def table_lines(layout: PageLayout, box) -> tuple[np.ndarray, np.ndarray]:
+    """Маски горизонтальных и вертикальных линий области: морфологическое открытие бинаризации по Оцу
+       длинными ядрами. Считаются один раз на область"""
+    x, y, w, h = (int(v) for v in box[:4])
+    ink = 255 - layout.otsu((x, y, w, h))
+    kernel_size = max(1, round(40 * layout.scale))
+
+    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, 1))
+    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, kernel_size))
+
+    return (cv2.morphologyEx(ink, cv2.MORPH_OPEN, horizontal_kernel),
+            cv2.morphologyEx(ink, cv2.MORPH_OPEN, vertical_kernel))
+
+def _line_groups(profile: np.ndarray, length: int, min_cover: float, margin: int) -> list[tuple[int, int]]:
+    """Линии сетки по проекции маски: группы подряд идущих строк, покрытых линией хотя бы на min_cover,
+       в виде (начало, конец). Если у таблицы нет внешней рамки, краем служит граница области"""
+    flags = profile >= min_cover
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], flags.astype(np.int8), [0]))))
+    groups = list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+    if not groups or groups[0][0] > margin:
+        groups.insert(0, (0, 0))
+    if groups[-1][1] < length - margin:
+        groups.append((length, length))
+    return groups
+
+def table_grid(layout: PageLayout, box, min_cover: float = 0.5) -> Optional[tuple[list, list]]:
+    """Ячейки таблицы по маскам линий: внутренние промежутки строк и столбцов в координатах страницы.
+       None, если сетка не находится (меньше двух столбцов или двух строк)"""
+    x, y, w, h = (int(v) for v in box[:4])
+    horizontal, vertical = table_lines(layout, (x, y, w, h))
+    margin = max(1, round(10 * layout.scale))
+
+    row_lines = _line_groups((horizontal > 0).sum(axis=1) / w, h, min_cover, margin)
+    col_lines = _line_groups((vertical > 0).sum(axis=0) / h, w, min_cover, margin)
+    rows = [(y + top[1], y + bottom[0]) for top, bottom in zip(row_lines, row_lines[1:]) if bottom[0] > top[1]]
+    cols = [(x + left[1], x + right[0]) for left, right in zip(col_lines, col_lines[1:]) if right[0] > left[1]]
+
+    if len(rows) < 2 or len(cols) < 2:
+        return None
+    return rows, cols
+
+def _cells(rows: list, cols: list) -> list[tuple[int, int, int, int]]:
+    """Ячейки (x0, y0, x1, y1) построчно"""
+    return [(x0, y0, x1, y1) for y0, y1 in rows for x0, x1 in cols]
+
+def ocr_cells(layout: PageLayout, cells: list, lang: str, gap: int = 20) -> list[str]:
+    """Распознает все непустые ячейки одним вызовом OCR (ocr_strips), строки ячейки склеиваются через пробел"""
+    texts = [""] * len(cells)
+    filled = [i for i, (x0, y0, x1, y1) in enumerate(cells) if layout.binary[y0:y1, x0:x1].any()]
+    crops = [layout.gray[y0:y1, x0:x1] for x0, y0, x1, y1 in (cells[i] for i in filled)]
+    for i, text in zip(filled, ocr_strips(crops, lang, gap)):
+        texts[i] = " ".join(text.split())
+    return texts
+
+def words_to_cells(words: list, rows: list, cols: list) -> list[str]:
+    """Раскладывает слова текстового слоя [(cx, cy, слово)] в координатах страницы по ячейкам сетки"""
+    texts = [[] for _ in range(len(rows) * len(cols))]
+    for cx, cy, word in words:
+        row = next((i for i, (y0, y1) in enumerate(rows) if y0 <= cy <= y1), None)
+        col = next((j for j, (x0, x1) in enumerate(cols) if x0 <= cx <= x1), None)
+        if row is not None and col is not None:
+            texts[row * len(cols) + col].append(word)
+    return [" ".join(cell) for cell in texts]
+
+def build_table(texts: list[str], rows: list, cols: list) -> Optional[dict]:
+    """Данные таблицы в формате TableSchema: первая строка - заголовок. None для пустой таблицы"""
+    if not any(text.strip() for text in texts):
+        return None
+
+    n = len(cols)
+    grid = [[text.strip() for text in texts[i:i + n]] for i in range(0, len(texts), n)]
+    return {"header": grid[0], "cells": grid[1:]}
+
+def recognize_table(layout: PageLayout, box, lang: str) -> Optional[dict]:
+    """Структура таблицы по области страницы: сетка по маскам линий, ячейки распознаются одним вызовом OCR"""
+    grid = table_grid(layout, box)
+    if grid is None:
+        return None
+
+    rows, cols = grid
+    return build_table(ocr_cells(layout, _cells(rows, cols), lang), rows, cols)
+
+def table_to_text(table: dict) -> str:
+    """Разметка таблицы для текста документа: строки таблицы с ячейками через |"""
+    lines = [" | ".join(row) for row in [table["header"], *table["cells"]]]
+    return "Таблица:\n" + "\n".join(lines)
+
+class TableRegion:
+    """Распознанная таблица в словаре изображений. На слайд она рендерится сразу из TableSchema,
+       без обращения к LLM; если рендер недоступен, сохраняется вырезанная область страницы"""
+    extension = ".png"
+    vis_type = "table"
+
+    def __init__(self, schema: TableSchema, region):
+        self.schema = schema
+        self.region = region
+
+    @classmethod
+    def from_table(cls, table: dict, region) -> Optional["TableRegion"]:
+        """None, если таблица не укладывается в ограничения TableSchema (от 2 до 6 столбцов, до 15 строк)"""
+        try:
+            return cls(TableSchema(data=table), region)
+        except ValueError:
+            return None
+
+    def save(self, path: str):
+        from visgen.render import render_visualization
+
+        try:
+            render_visualization(self.schema, path)
+        except ValueError:
+            self.region.save(path)
+
+    def __repr__(self) -> str:
+        return f"TableRegion(columns={len(self.schema.data['header'])}, rows={len(self.schema.data['cells'])})"
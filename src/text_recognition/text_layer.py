@@ -0,0 +1,82 @@
+import shutil
+import subprocess
+import xml.etree.ElementTree as ET
+from typing import Optional
+
+XHTML_NS = "{http://www.w3.org/1999/xhtml}"
+
+MIN_TEXT_LAYER_CHARS = 30
+MIN_ALNUM_RATIO = 0.5
+
+def has_text_layer_support() -> bool:
+    """Проверяет, установлен ли pdftotext из poppler"""
+    return shutil.which("pdftotext") is not None
+
+def _bbox(element) -> tuple[float, float, float, float]:
+    return tuple(float(element.get(key)) for key in ("xMin", "yMin", "xMax", "yMax"))
+
+def extract_text_layer(pdf_path: str, first_page: int, last_page: int) -> list[dict]:
+    """Достает встроенный текстовый слой страниц first_page..last_page вместе с координатами слов.
+       Координаты в пунктах pdf, страница описывается словарем
+       {"width", "height", "blocks": [{"lines": [{"words": [(x0, y0, x1, y1, text)]}]}]}"""
+    result = subprocess.run(
+        ["pdftotext", "-bbox-layout", "-enc", "UTF-8", "-f", str(first_page), "-l", str(last_page), pdf_path, "-"],
+        capture_output=True, check=True
+    )
+    root = ET.fromstring(result.stdout)
+
+    pages = []
+    for page in root.iter(f"{XHTML_NS}page"):
+        blocks = []
+        for block in page.iter(f"{XHTML_NS}block"):
+            lines = []
+            for line in block.iter(f"{XHTML_NS}line"):
+                words = [(*_bbox(word), word.text) for word in line.iter(f"{XHTML_NS}word") if word.text]
+                if words:
+                    lines.append({"words": words})
+            if lines:
+                blocks.append({"lines": lines})
+
+        pages.append({
+            "width": float(page.get("width")),
+            "height": float(page.get("height")),
+            "blocks": blocks,
+        })
+
+    return pages
+
+def is_usable(page: dict) -> bool:
+    """Текстовый слой пригоден, если в нем достаточно символов и это не мусор из шрифтов без ToUnicode"""
+    text = "".join(word[4] for block in page["blocks"] for line in block["lines"] for word in line["words"])
+    if len(text) < MIN_TEXT_LAYER_CHARS:
+        return False
+
+    alnum = sum(1 for char in text if char.isalnum())
+    return alnum / len(text) >= MIN_ALNUM_RATIO
+
+class TextLayerReader:
+    """Потоковое чтение текстового слоя окнами страниц, в памяти держится только текущее окно"""
+
+    def __init__(self, pdf_path: str, window: int = 4):
+        self.pdf_path = pdf_path
+        self.window = window
+        self._first_page = None
+        self._last_page = None
+        self._pages = []
+
+    def page(self, page_number: int) -> Optional[dict]:
+        """Текстовый слой страницы с номером page_number (с единицы) или None, если он непригоден"""
+        if self._first_page is None or not (self._first_page <= page_number <= self._last_page):
+            self._first_page = page_number
+            self._last_page = page_number + self.window - 1
+            try:
+                self._pages = extract_text_layer(self.pdf_path, self._first_page, self._last_page)
+            except (subprocess.CalledProcessError, ET.ParseError):
+                self._pages = []
+
+        offset = page_number - self._first_page
+        if offset >= len(self._pages):
+            return None
+
+        page = self._pages[offset]
+        return page if is_usable(page) else None
@@ -0,0 +1,22 @@
+import os
+import re
+import sys
+
+import pytest
+
+# модули проекта импортируются от папки src, как при запуске бота
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+class RegexSentenceTokenizer:
+    """Предложения до точки, вопросительного или восклицательного знака - вместо модели Punkt"""
+    pattern = re.compile(r"[^\s.!?][^.!?]*[.!?]*")
+
+    def span_tokenize(self, text: str):
+        for match in self.pattern.finditer(text):
+            yield match.start(), match.start() + len(match.group(0).rstrip())
+
+@pytest.fixture
+def sentence_tokenizer(monkeypatch):
+    from text_recognition import document
+
+    monkeypatch.setattr(document, "sentence_tokenizer", lambda language="english": RegexSentenceTokenizer())
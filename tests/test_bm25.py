@@ -0,0 +1,23 @@
+import numpy as np
+
+from rag.retriever.bm25 import BM25Index
+
+TEXTS = ["кошка сидит на окне", "собака лает", "кошки и собаки дружат", "рыба молчит"]
+
+def test_top_returns_only_matches_by_score():
+    indices, scores = BM25Index(TEXTS).top("кошка", 5)
+    assert sorted(indices.tolist()) == [0, 2]
+    assert (scores > 0).all()
+
+def test_top_ranks_more_matched_terms_first():
+    indices, scores = BM25Index(TEXTS).top("кошка собака", 2)
+    assert indices.tolist()[0] == 2
+    assert len(indices) == 2
+    assert scores[0] > scores[1]
+
+def test_top_without_matches_is_empty():
+    indices, scores = BM25Index(TEXTS).top("самолет", 3)
+    assert indices.size == 0 and scores.size == 0
+
+def test_scores_of_empty_query_are_zero():
+    np.testing.assert_array_equal(BM25Index(TEXTS).scores(""), np.zeros(len(TEXTS)))
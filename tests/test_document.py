@@ -0,0 +1,57 @@
+from text_recognition.document import Document
+
+TEXT = "  First block.\n\n[IMAGE_1]\n\n \nSecond block [IMAGE_2] here.  \n\n"
+
+def texts(document: Document, spans) -> list[str]:
+    return [document.span_text(span) for span in spans]
+
+def test_blocks_are_stripped_and_skip_empty_ones():
+    document = Document(TEXT)
+    assert texts(document, document.blocks) == ["First block.", "[IMAGE_1]", "Second block [IMAGE_2] here."]
+
+def test_pages_from_texts_cover_the_document():
+    document = Document.from_pages(["page one\n\n", "page two"])
+    assert document.text == "page one\n\npage two"
+    assert document.pages == [(0, 10), (10, 18)]
+    assert [document.page_of(position) for position in (0, 9, 10, 17)] == [0, 0, 1, 1]
+
+def test_markers_are_indexed_by_first_occurrence():
+    document = Document("[IMAGE_1] text [IMAGE_2] and [IMAGE_1] again")
+    assert document.anchors == {"[IMAGE_1]": (0, 9), "[IMAGE_2]": (15, 24)}
+    assert document.position("[IMAGE_2]") == 15
+    assert document.position("[IMAGE_3]") is None
+
+def test_markers_in_needs_the_whole_anchor():
+    document = Document("[IMAGE_1] text [IMAGE_2] and [IMAGE_1] again")
+    assert document.markers_in(0, len(document)) == ["[IMAGE_1]", "[IMAGE_2]"]
+    assert document.markers_in(10, len(document)) == ["[IMAGE_2]", "[IMAGE_1]"]
+    assert document.markers_in(1, 20) == []
+    assert document.markers_in(10, 24) == ["[IMAGE_2]"]
+
+SENTENCES = "One two. Three four!\n\nFive six\n\nSeven. Eight?"
+
+def test_sentences_stay_inside_blocks(sentence_tokenizer):
+    document = Document(SENTENCES)
+    assert texts(document, document.sentences) == ["One two.", "Three four!", "Five six", "Seven.", "Eight?"]
+
+def test_sentence_index_is_built_once(sentence_tokenizer):
+    document = Document(SENTENCES)
+    starts, ends = document.sentence_bounds()
+    assert document.sentence_bounds()[0] is starts
+    assert list(zip(starts, ends)) == document.sentences
+
+def test_sentence_neighbours(sentence_tokenizer):
+    document = Document(SENTENCES)
+    # "Three four!" занимает [9, 20), "Five six" - [22, 30)
+    assert document.sentence_end_before(21) == 20
+    assert document.sentence_end_after(21) == 30
+    assert document.sentence_start_before(21) == 9
+    assert document.sentence_start_after(21) == 22
+    assert document.sentence_end_before(3) is None
+    assert document.sentence_start_after(len(SENTENCES)) is None
+
+def test_sentence_count_counts_starts(sentence_tokenizer):
+    document = Document(SENTENCES)
+    assert document.sentence_count(0, len(SENTENCES)) == 5
+    assert document.sentence_count(1, 22) == 1
+    assert document.sentence_count(22, 23) == 1
@@ -0,0 +1,34 @@
+from text_recognition.embedded_images import has_twins, match_embedded_images
+
+def image(index: int, obj: int, width: int = 300, height: int = 200) -> dict:
+    """Строка pdfimages -list: изображение, выведенное при 100 ppi"""
+    return {"index": index, "type": "image", "width": width, "height": height, "color": "rgb", "enc": "jpeg",
+            "object": obj, "x_ppi": 100.0, "y_ppi": 100.0}
+
+# при 200 dpi изображения 300x200 выводятся рамками 600x400
+LEFT = (100, 100, 600, 400)
+RIGHT = (800, 100, 600, 400)
+
+def test_matches_by_size():
+    small = image(1, 8, width=150, height=100)
+    matches = match_embedded_images([image(0, 7), small], [(100, 600, 300, 200), LEFT])
+    assert matches == {0: small, 1: image(0, 7)}
+
+def test_same_size_images_are_not_guessed():
+    images = [image(0, 7), image(1, 8)]
+    assert has_twins(images)
+    assert match_embedded_images(images, [LEFT, RIGHT]) == {}
+
+def test_positions_resolve_same_size_images():
+    images = [image(0, 7), image(1, 8)]
+    # положения в пунктах: правая картинка выведена первой
+    positions = [(box[0] * 72 / 200, box[1] * 72 / 200, 216, 144) for box in (RIGHT, LEFT)]
+    assert match_embedded_images(images, [LEFT, RIGHT], positions=positions) == {0: images[1], 1: images[0]}
+
+def test_repeated_image_matches_every_box():
+    images = [image(0, 7), image(1, 7)]
+    assert not has_twins(images)
+    assert len(match_embedded_images(images, [LEFT, RIGHT])) == 2
+
+def test_more_boxes_than_draws_are_not_guessed():
+    assert match_embedded_images([image(0, 7)], [LEFT, RIGHT]) == {}
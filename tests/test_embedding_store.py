@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+
+from rag.embeddings.store import EmbeddingStore
+
+class CountingModel:
+    """Модель с векторами-длинами текста, запоминает закодированные тексты"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+def shards(store: EmbeddingStore) -> list[str]:
+    return sorted(shard for _, shard, _ in store._entries())
+
+def test_hits_are_read_without_encoding(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dtype="float32")
+    model = CountingModel()
+    first = store.encode(model, "m", ["a", "bb"], prefix="p: ")
+    assert model.encoded == ["p: a", "p: bb"]
+
+    second = store.encode(model, "m", ["bb", "ccc", "a"], prefix="p: ")
+    assert model.encoded == ["p: a", "p: bb", "p: ccc"]
+    np.testing.assert_array_equal(second, [[5, 1], [6, 1], [4, 1]])
+    np.testing.assert_array_equal(first, second[[2, 0]])
+
+def test_other_process_shards_are_found(tmp_path):
+    EmbeddingStore(str(tmp_path)).encode(CountingModel(), "m", ["a"])
+    model = CountingModel()
+    EmbeddingStore(str(tmp_path)).encode(model, "m", ["a"])
+    assert model.encoded == []
+
+def test_evicts_least_recently_read_shards(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    for i, text in enumerate("abc"):
+        store.encode(CountingModel(), "m", [text])
+        # только что записанная часть - самая новая
+        os.utime(max(shards(store), key=os.path.getmtime), (i, i))
+    old_a, old_b, _ = sorted(shards(store), key=os.path.getmtime)
+    # места на три с половиной части: четвертая вытесняет одну старую
+    store.max_bytes = store._size * 7 // 6
+    # чтение обновляет время части, поэтому вытесняется b, а не a
+    store.encode(CountingModel(), "m", ["a"])
+    store.encode(CountingModel(), "m", ["d"])
+
+    assert not os.path.exists(old_b)
+    assert os.path.exists(old_a)
+    model = CountingModel()
+    store.encode(model, "m", ["a", "b"])
+    assert model.encoded == ["b"]
+
+def test_vanished_shard_is_forgotten(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.encode(CountingModel(), "m", ["a"])
+    # другой процесс вытеснил часть
+    for shard in shards(store):
+        os.remove(shard[:-len(".npy")] + ".keys.json")
+        os.remove(shard)
+
+    model = CountingModel()
+    np.testing.assert_array_equal(store.encode(model, "m", ["a"]), [[1, 1]])
+    assert model.encoded == ["a"]
+    assert len(store._known[store._namespace("m", "")]) == 1
+
+def test_corrupt_shard_is_encoded_again(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.encode(CountingModel(), "m", ["a", "bb"])
+    (corrupt,) = shards(store)
+    with open(corrupt, "r+b") as f:
+        f.truncate(os.path.getsize(corrupt) - 4)
+
+    model = CountingModel()
+    np.testing.assert_array_equal(store.encode(model, "m", ["bb", "a"]), [[2, 1], [1, 1]])
+    assert model.encoded == ["bb", "a"]
+    # испорченная часть больше не читается
+    model = CountingModel()
+    store.encode(model, "m", ["a"])
+    assert model.encoded == []
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+
+from rag.retriever.ivf_index import IVFIndex, prune_indexes, recall_at_k
+
+def clustered(n: int = 6000, dim: int = 64, clusters: int = 60, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Нормированные векторы вокруг случайных центров и запросы рядом с ними"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dim))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    queries = vectors[rng.integers(0, n, 50)] + 0.1 * rng.normal(size=(50, dim))
+    return vectors, queries.astype(np.float32)
+
+def test_recall_at_default_nprobe():
+    vectors, queries = clustered()
+    index = IVFIndex().build(vectors)
+    assert recall_at_k(index, vectors, queries, k=10) >= 0.9
+
+def test_search_pads_missing_results():
+    vectors, queries = clustered(n=5)
+    scores, indices = IVFIndex().build(vectors).search(queries[:2], 10)
+    assert (indices[:, 5:] == -1).all()
+    assert np.isneginf(scores[:, 5:]).all()
+
+def test_save_load_round_trip(tmp_path):
+    vectors, queries = clustered()
+    index = IVFIndex().build(vectors)
+    index.fingerprint = "abc"
+    path = tmp_path / "index.npz"
+    index.save(str(path))
+
+    loaded = IVFIndex.load(str(path))
+    assert loaded.fingerprint == "abc"
+    assert loaded.nprobe == index.nprobe
+    for expected, actual in zip(index.search(queries, 10), loaded.search(queries, 10)):
+        np.testing.assert_array_equal(expected, actual)
+    assert os.listdir(tmp_path) == ["index.npz"]
+
+def test_prune_indexes_removes_oldest(tmp_path):
+    for i, name in enumerate(("old.npz", "middle.npz", "new.npz")):
+        path = tmp_path / name
+        path.write_bytes(b"0" * 100)
+        os.utime(path, (i, i))
+    (tmp_path / "other.txt").write_bytes(b"0" * 1000)
+
+    prune_indexes(str(tmp_path), 250)
+    assert sorted(os.listdir(tmp_path)) == ["middle.npz", "new.npz", "other.txt"]
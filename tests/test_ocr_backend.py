@@ -0,0 +1,38 @@
+import numpy as np
+
+from text_recognition import ocr_backend
+
+class RowsBackend(ocr_backend.OCRBackend):
+    """Движок-заглушка: каждая серия строк с чернилами - одна строка из одного слова с яркостью чернил"""
+    name = "rows"
+
+    def image_to_data(self, image, lang: str) -> dict:
+        ink = (image < 128).any(axis=1)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], ink.astype(np.int8), [0]))))
+        data = {key: [] for key in ("level", "block_num", "par_num", "line_num", "text", "top", "height")}
+        for line, (top, bottom) in enumerate(zip(edges[::2], edges[1::2]), start=1):
+            data["level"].append(5)
+            data["block_num"].append(1)
+            data["par_num"].append(1)
+            data["line_num"].append(line)
+            data["text"].append(f"ink{int(image[top:bottom].min())}")
+            data["top"].append(int(top))
+            data["height"].append(int(bottom - top))
+        return data
+
+def strip(*inks: int) -> np.ndarray:
+    """Фрагмент со строкой чернил яркости ink на каждую строку текста"""
+    crop = np.full((20 * len(inks), 50), 255, dtype=np.uint8)
+    for i, ink in enumerate(inks):
+        crop[20 * i + 5:20 * i + 15, 10:40] = ink
+    return crop
+
+def test_ocr_strips_returns_text_of_each_strip(monkeypatch):
+    monkeypatch.setattr(ocr_backend, "_backend", RowsBackend())
+    blank = np.full((30, 50), 255, dtype=np.uint8)
+    texts = ocr_backend.ocr_strips([strip(10), blank, strip(20, 30)], "eng")
+    assert texts == ["ink10", "", "ink20\nink30"]
+
+def test_ocr_strips_without_crops_skips_ocr(monkeypatch):
+    monkeypatch.setattr(ocr_backend, "_backend", None)
+    assert ocr_backend.ocr_strips([], "eng") == []
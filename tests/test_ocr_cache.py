@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+from text_recognition import ocr_cache
+from text_recognition.ocr_cache import OCRCache
+
+def disk_size(cache: OCRCache) -> int:
+    return sum(size for _, _, size in cache._entries())
+
+def test_get_returns_put_value(tmp_path):
+    cache = OCRCache(str(tmp_path))
+    key = cache.key(np.zeros((4, 4), dtype=np.uint8), dpi=200)
+    assert cache.get(key) is None
+    cache.put(key, {"text": "страница", "boxes": [[1, 2, 3, 4]]})
+    assert cache.get(key) == {"text": "страница", "boxes": [[1, 2, 3, 4]]}
+
+def test_key_depends_on_pixels_and_params(tmp_path):
+    key = OCRCache(str(tmp_path)).key
+    page = np.zeros((4, 4), dtype=np.uint8)
+    other = page.copy()
+    other[0, 0] = 1
+    assert key(page, dpi=200) == key(page.copy(), dpi=200)
+    assert key(page, dpi=200) != key(other, dpi=200)
+    assert key(page, dpi=200) != key(page, dpi=300)
+
+def test_overwrite_keeps_size_exact(tmp_path):
+    cache = OCRCache(str(tmp_path))
+    cache.put("a" * 64, {"text": "x" * 100})
+    cache.put("a" * 64, {"text": "x" * 10})
+    cache.put("b" * 64, {"text": "y"})
+    assert cache._size == disk_size(cache)
+
+def test_size_counts_entries_written_before(tmp_path):
+    OCRCache(str(tmp_path)).put("a" * 64, {"text": "x" * 100})
+    cache = OCRCache(str(tmp_path))
+    cache.put("b" * 64, {"text": "y"})
+    assert cache._size == disk_size(cache)
+
+def test_unserializable_value_leaves_no_files(tmp_path):
+    cache = OCRCache(str(tmp_path))
+    cache.put("a" * 64, {"text": object()})
+    assert cache.get("a" * 64) is None
+    assert [name for _, _, names in os.walk(tmp_path) for name in names] == []
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = OCRCache(str(tmp_path))
+    for i, key in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+        cache.put(key, {"text": "x" * 80})
+        os.utime(cache._path(key), (i, i))
+    # места на три с половиной записи: четвертая вытесняет одну старую
+    cache.max_bytes = disk_size(cache) * 7 // 6
+    # чтение обновляет время записи, поэтому вытесняется b, а не a
+    cache.get("a" * 64)
+    cache.put("d" * 64, {"text": "x" * 80})
+
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None
+    assert cache.get("d" * 64) is not None
+    assert cache._size == disk_size(cache) <= cache.max_bytes
+
+def test_get_cache_is_created_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "_cache", None)
+    monkeypatch.setenv("OCR_CACHE_DIR", str(tmp_path))
+    assert ocr_cache.get_cache() is ocr_cache.get_cache()
+    monkeypatch.delenv("OCR_CACHE_DIR")
+    monkeypatch.setattr(ocr_cache, "_cache", None)
+    assert ocr_cache.get_cache() is None
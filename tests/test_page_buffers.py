@@ -0,0 +1,20 @@
+import numpy as np
+
+from text_recognition import page_buffers
+from text_recognition.page_buffers import SharedPageBuffers, page_view
+
+def test_regrown_slot_replaces_old_mapping(monkeypatch):
+    monkeypatch.setattr(page_buffers, "_attached", {})
+    with SharedPageBuffers(1) as buffers:
+        slot, small = buffers.put(np.full((4, 4), 1, dtype=np.uint8))
+        assert page_view(small).sum() == 16
+        buffers.release(slot)
+
+        slot, large = buffers.put(np.full((8, 8, 3), 2, dtype=np.uint8))
+        assert large[1] != small[1]
+        assert page_view(large).sum() == 8 * 8 * 3 * 2
+        assert len(page_buffers._attached) == 1
+        buffers.release(slot)
+
+        for memory in page_buffers._attached.values():
+            memory.close()
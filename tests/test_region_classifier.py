@@ -0,0 +1,24 @@
+import cv2
+import numpy as np
+import pytest
+
+from text_recognition.layout import PageLayout
+
+def shaded_paragraph(fill: int, ink: int) -> np.ndarray:
+    """Страница с абзацем из десяти строк на заливке цвета fill"""
+    page = np.full((1200, 1000), 255, dtype=np.uint8)
+    cv2.rectangle(page, (100, 200), (900, 700), fill, -1)
+    for i in range(10):
+        cv2.putText(page, "lorem ipsum dolor sit amet consectetur", (130, 250 + i * 45),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, ink, 2)
+    return page
+
+@pytest.mark.parametrize("fill, ink", [(40, 255), (150, 0)], ids=["white-on-dark", "dark-on-grey"])
+def test_text_on_fill_is_recognized(fill, ink):
+    layout = PageLayout(shaded_paragraph(fill, ink))
+    assert len(layout.boxes) == 0
+    assert layout.text_boxes.tolist() == [[100, 200, 801, 501]]
+
+def test_solid_fill_without_text_stays_region():
+    layout = PageLayout(shaded_paragraph(40, 40))
+    assert layout.boxes.tolist() == [[100, 200, 801, 501]]
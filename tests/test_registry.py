@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from rag.embeddings import registry
+
+class FakeModel:
+    def __init__(self, name, device=None):
+        self.name = name
+
+@pytest.fixture
+def models(monkeypatch):
+    monkeypatch.setattr(registry, "SentenceTransformer", FakeModel)
+    # idle_seconds=0: любая свободная модель сразу считается простаивающей
+    models = registry.ModelRegistry(idle_seconds=0)
+    yield models
+    if models._timer is not None:
+        models._timer.cancel()
+
+def test_acquired_model_is_not_evicted(models):
+    model = models.acquire("frida", "cpu")
+    models.evict_idle()
+    models.clear()
+    assert models.get("frida", "cpu") is model
+    assert models.metrics()["loads"] == 1
+    assert models.metrics()["in_use"] == ["frida"]
+
+def test_released_model_is_evicted(models):
+    model = models.acquire("frida", "cpu")
+    models.acquire("frida", "cpu")
+    models.release(model)
+    models.evict_idle()
+    assert models.metrics()["loaded"] == ["frida"]
+
+    models.release(model)
+    models.evict_idle()
+    assert models.metrics()["loaded"] == []
+    assert models.get("frida", "cpu") is not model
+
+def test_no_idle_timer_while_all_models_are_held(models):
+    models.acquire("frida", "cpu")
+    if models._timer is not None:
+        models._timer.cancel()
+        models._timer = None
+    models.evict_idle()
+    assert models._timer is None
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from rag.retriever.ivf_index import IVFIndex
+
+class FakeModel:
+    """Модель эмбеддингов с векторами-частотами букв, чтобы поиск был детерминированным"""
+    device = "cpu"
+
+    def encode(self, texts, convert_to_numpy=True, convert_to_tensor=False):
+        import torch
+
+        vectors = np.array([[text.count(letter) for letter in "абвгдежз"] for text in texts], dtype=np.float32) + 0.01
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return torch.from_numpy(vectors) if convert_to_tensor else vectors
+
+@pytest.fixture
+def retriever_module(monkeypatch):
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    from rag.retriever import retriever
+
+    monkeypatch.setattr(retriever, "acquire_model", lambda name: FakeModel())
+    monkeypatch.setattr(retriever, "release_model", lambda model: None)
+    monkeypatch.setattr(retriever, "get_store", lambda: None)
+    monkeypatch.setattr(retriever, "encode_documents",
+                        lambda model, name, texts, prefix="": model.encode([prefix + text for text in texts]))
+    return retriever
+
+def make_retriever(module, threshold: int, segments: list[str], **kwargs):
+    class SmallRetriever(module.Retriever):
+        ann_threshold = threshold
+        limit = 4
+
+        def build_query(self, slide, index: int) -> str:
+            return slide
+
+        def retrieve_indices(self, queries: list[str]) -> list[int]:
+            return self.retrieve_relevant_indices(queries)[0]
+
+    return SmallRetriever(segments, **kwargs)
+
+SEGMENTS = ["аааб", "бббв", "вввг", "гггд", "дддe", "еееж", "жжжз", "зззa"] * 4
+
+def test_retriever_switches_to_index_at_threshold(retriever_module, tmp_path, monkeypatch):
+    below = make_retriever(retriever_module, len(SEGMENTS) + 1, SEGMENTS)
+    assert below.index is None
+
+    path = tmp_path / "index.npz"
+    at = make_retriever(retriever_module, len(SEGMENTS), SEGMENTS, index_path=str(path))
+    assert at.index is not None
+    assert path.exists()
+    assert at.retrieve_indices(["ааа"]) == below.retrieve_indices(["ааа"])
+
+    # сохраненный индекс загружается без кодирования сегментов
+    monkeypatch.setattr(retriever_module, "encode_documents", None)
+    reloaded = make_retriever(retriever_module, len(SEGMENTS), SEGMENTS, index_path=str(path))
+    assert reloaded.index.fingerprint == at.index.fingerprint
+
+def test_retriever_rebuilds_corrupted_index(retriever_module, tmp_path):
+    path = tmp_path / "index.npz"
+    path.write_bytes(b"PK\x03\x04 truncated")
+    retriever = make_retriever(retriever_module, len(SEGMENTS), SEGMENTS, index_path=str(path))
+    assert retriever.index is not None
+    assert IVFIndex.load(str(path)).fingerprint == retriever.index.fingerprint
+
+def test_lexical_fills_limit_with_unmatched_segments(retriever_module):
+    retriever = make_retriever(retriever_module, len(SEGMENTS) + 1, SEGMENTS[:8], mode="lexical")
+    hits = retriever.search(["аааб", "самолет"])
+    assert [hit.index for hit in hits[0]] == [0, 1, 2, 3]
+    assert hits[0][0].score > 0 and [hit.score for hit in hits[0][1:]] == [0.0] * 3
+    assert [hit.index for hit in hits[1]] == [0, 1, 2, 3]
+
+def test_hybrid_fills_limit_from_dense_scores(retriever_module):
+    retriever = make_retriever(retriever_module, len(SEGMENTS) + 1, SEGMENTS[:8], mode="hybrid")
+    hits = retriever.search(["аааб", "самолет"])
+    assert [len(query_hits) for query_hits in hits] == [4, 4]
+    assert hits[0][0].index == 0
+    scores = [hit.score for hit in hits[0]]
+    assert scores == sorted(scores, reverse=True)
+
+def test_hybrid_without_matches_searches_all_segments(retriever_module):
+    retriever = make_retriever(retriever_module, len(SEGMENTS) + 1, SEGMENTS[:8], mode="hybrid")
+    dense = make_retriever(retriever_module, len(SEGMENTS) + 1, SEGMENTS[:8])
+    assert retriever.retrieve_indices(["жжз самолет"]) == dense.retrieve_indices(["жжз самолет"])
@@ -0,0 +1,27 @@
+from text_recognition.script_detection import ScriptDetector, script_histogram, select_languages
+
+def test_select_languages_keeps_scripts_of_the_page():
+    assert select_languages(script_histogram("Годовой отчет за год"), "rus+eng") == "rus"
+    assert select_languages(script_histogram("Отчет annual report"), "rus+eng") == "rus+eng"
+    assert select_languages(script_histogram(""), "rus+eng") == "rus+eng"
+
+def detector_with(choices: list[str], redetect_every: int) -> tuple[ScriptDetector, list]:
+    detector = ScriptDetector("rus+eng", redetect_every=redetect_every)
+    calls = []
+
+    def detect(layout):
+        calls.append(layout)
+        return choices[len(calls) - 1]
+
+    detector.detect = detect
+    return detector, calls
+
+def test_one_sided_choice_is_reused_until_redetect():
+    detector, calls = detector_with(["eng", "rus"], redetect_every=3)
+    assert [detector.detect_next(page) for page in range(5)] == ["eng", "eng", "eng", "rus", "rus"]
+    assert calls == [0, 3]
+
+def test_mixed_choice_is_detected_again():
+    detector, calls = detector_with(["rus+eng", "rus+eng", "eng"], redetect_every=3)
+    assert [detector.detect_next(page) for page in range(4)] == ["rus+eng", "rus+eng", "eng", "eng"]
+    assert calls == [0, 1, 2]
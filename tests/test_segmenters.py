@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from text_recognition.document import Document
+from rag.segmenter.page_segmenter import PageSegmenter
+from rag.segmenter.paragraph_segmenter import ParagraphSegmenter
+from rag.segmenter.segmenter import Segmenter
+from rag.segmenter.simple_segmenter import SimpleSegmenter
+
+def covered(document: Document, spans: list) -> str:
+    return "".join(document.text[start:end] for start, end in spans)
+
+def test_split_matches_spans(sentence_tokenizer):
+    segmenter = SimpleSegmenter("One. Two.\n\nThree.")
+    assert segmenter.split() == ["One.", "Two.", "Three."]
+    assert list(segmenter.spans()) == [(0, 4), (5, 9), (11, 17)]
+
+def test_default_spans_find_segments_in_text():
+    class Fixed(Segmenter):
+        def split(self):
+            return ["beta", "missing", "alpha"]
+
+    assert list(Fixed("alpha beta alpha").spans()) == [(6, 10), None, (11, 16)]
+
+def test_paragraphs_join_short_blocks(sentence_tokenizer):
+    document = Document("A. B.\n\nC.\n\nD. E.\n\nF.")
+    spans = list(ParagraphSegmenter(document, min_sentences=2).spans())
+    assert [document.span_text(span) for span in spans] == ["A. B.\n\nC.", "D. E.\n\nF."]
+
+def test_pages_cover_the_document_with_overlap(sentence_tokenizer):
+    document = Document(" ".join(f"Sentence number {i} of the document." for i in range(300)))
+    spans = list(PageSegmenter(document).spans())
+    assert spans[0][0] == 0 and spans[-1][1] == len(document)
+    assert all(start < end for start, end in spans)
+    # соседние страницы перекрываются или стыкуются, текст не теряется
+    assert all(next_start <= end + 1 for (_, end), (next_start, _) in zip(spans, spans[1:]))
+
+def test_pages_do_not_cut_tables(sentence_tokenizer):
+    table = "<table>" + "<tr><td>cell</td></tr>" * 150 + "</table>"
+    document = Document("Intro. " * 200 + table + " Outro." * 10)
+    table_start = document.text.index("<table>")
+    table_end = table_start + len(table)
+    for start, end in PageSegmenter(document).spans():
+        assert not table_start < end < table_end
+
+def test_windows_end_on_sentences(sentence_tokenizer):
+    pytest.importorskip("tokenizers")
+    from rag.segmenter.window_segmenter import WindowSegmenter
+
+    document = Document(" ".join(f"Sentence number {i} of a long document." for i in range(1000)))
+    spans = list(WindowSegmenter(document).spans())
+    assert spans[0][0] == 0 and spans[-1][1] == len(document)
+    assert all(document.text[end - 1] == "." for _, end in spans)
+
+def test_semantic_spans_cut_at_topic_change(sentence_tokenizer, monkeypatch):
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    from rag.segmenter import semantic_segmenter
+
+    class TopicModel:
+        """Эмбеддинг предложения - его тема: первое слово apple или stone"""
+        def encode(self, sentences, **kwargs):
+            return np.array([[1.0, 0.0] if sentence.startswith("apple") else [0.0, 1.0] for sentence in sentences])
+
+    monkeypatch.setattr(semantic_segmenter, "acquire_model", lambda name: TopicModel())
+    monkeypatch.setattr(semantic_segmenter, "release_model", lambda model: None)
+    text = " ".join(["apple pie."] * 6 + ["stone wall."] * 6)
+    segmenter = semantic_segmenter.SemanticSegmenter(text, window=2)
+    spans = list(segmenter.spans())
+    segmenter.clear()
+    assert [segmenter.data[start:end] for start, end in spans] == [" ".join(["apple pie."] * 6),
+                                                                     " ".join(["stone wall."] * 6)]